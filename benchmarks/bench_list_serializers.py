@@ -0,0 +1,75 @@
+"""
+Per-row cost of the list endpoints: DRF serializers vs. orders.fast_reads.
+
+Usage:
+    python benchmarks/bench_list_serializers.py [--sizes 100,1000,10000]
+
+Both paths include the database query, so the numbers reflect what a list
+request pays end to end before JSON rendering.
+"""
+
+import argparse
+
+from common import setup_django, timed
+
+
+def populate(count):
+    from django.contrib.auth import get_user_model
+    from orders.models import Customer, Inventory, Order, Transaction
+
+    User = get_user_model()
+    User.objects.bulk_create(User(username=f"user{i}") for i in range(count))
+    users = list(User.objects.order_by("id"))
+    Customer.objects.bulk_create(
+        Customer(user=user, name=f"Customer {i}", code=f"C{i:06d}", phone_number=f"+2547{i:08d}")
+        for i, user in enumerate(users)
+    )
+    Inventory.objects.bulk_create(
+        Inventory(name=f"Item {i}", on_hand=i % 20, warn_limit=5) for i in range(count)
+    )
+    customer = Customer.objects.first()
+    # bulk_create skips the order signals (transactions and SMS).
+    order, = Order.objects.bulk_create([Order(customer=customer)])
+    Transaction.objects.bulk_create(
+        Transaction(order=order, customer=customer, action="UPDATE_ORDER", description="Order updated")
+        for _ in range(count)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="100,1000,10000")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    teardown = setup_django()
+    try:
+        from orders.fast_reads import (
+            CUSTOMER_FIELDS, INVENTORY_FIELDS, TRANSACTION_FIELDS, render_rows,
+        )
+        from orders.models import Customer, Inventory, Transaction
+        from orders.serializers import (
+            CustomerSerializer, InventorySerializer, TransactionSerializer,
+        )
+
+        populate(max(sizes))
+        print(f"{'resource':<12} {'rows':>6} {'serializer us/row':>18} {'fast us/row':>12} {'speedup':>8}")
+        for name, model, serializer, fields in [
+            ("customer", Customer, CustomerSerializer, CUSTOMER_FIELDS),
+            ("inventory", Inventory, InventorySerializer, INVENTORY_FIELDS),
+            ("transaction", Transaction, TransactionSerializer, TRANSACTION_FIELDS),
+        ]:
+            for size in sizes:
+                queryset = model.objects.order_by("id")[:size]
+                slow = timed(lambda: serializer(queryset.all(), many=True).data)
+                fast = timed(lambda: render_rows(queryset.all(), fields))
+                print(
+                    f"{name:<12} {size:>6} {slow / size * 1e6:>18.2f} "
+                    f"{fast / size * 1e6:>12.2f} {slow / fast:>7.1f}x"
+                )
+    finally:
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
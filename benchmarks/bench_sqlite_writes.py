@@ -0,0 +1,120 @@
+"""
+Multi-process order write throughput on SQLite: default vs. SQLITE_TUNED.
+
+Usage:
+    python benchmarks/bench_sqlite_writes.py [--workers 8] [--seconds 5]
+
+Each worker process repeatedly creates an order with one item, then fulfills
+it in a second transaction (the same reads, writes and signal handlers as
+the API: the fulfillment transaction reads before it writes, which is where
+default SQLite transactions fail to upgrade their lock), against a fresh
+database file per mode. Reports committed orders per
+second and the number of "database is locked" errors.
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT
+
+BASE_ENV = {
+    "DJANGO_SETTINGS_MODULE": "core.settings",
+    "AUTH0_DOMAIN": "example.auth0.com",
+    "AUTH0_AUDIENCE": "benchmark",
+    # Keep the benchmark offline: SMS delivery is not what is measured.
+    "SMS_PROVIDER": "null",
+}
+
+
+def setup_worker(env):
+    os.environ.update(env)
+    sys.path.insert(0, str(ROOT))
+    import django
+    django.setup()
+
+
+def seed(env):
+    setup_worker(env)
+    from django.contrib.auth import get_user_model
+    from orders.models import Customer, Inventory
+
+    user = get_user_model().objects.create_user(username="bench")
+    Customer.objects.create(user=user, name="Bench", code="BENCH", phone_number="0700000000")
+    Inventory.objects.create(name="Widget", on_hand=10**9)
+
+
+def write_orders(env, seconds, results):
+    setup_worker(env)
+    from django.db import OperationalError, transaction
+    from orders.models import Customer, Inventory, Order, OrderItem
+
+    customer = Customer.objects.get(code="BENCH")
+    inventory = Inventory.objects.get(name="Widget")
+    committed = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with transaction.atomic():
+                order = Order.objects.create(customer=customer)
+                OrderItem.objects.create(order=order, inventory=inventory, quantity=1)
+            with transaction.atomic():
+                order.state = "FULFILLED"
+                order.save()
+            committed += 1
+        except OperationalError as exc:
+            if "locked" not in str(exc):
+                raise
+            locked += 1
+    results.put((committed, locked))
+
+
+def run(mode, workers, seconds, directory):
+    env = {
+        **BASE_ENV,
+        "SQLITE_PATH": os.path.join(directory, f"{mode}.sqlite3"),
+        "SQLITE_TUNED": str(mode == "tuned"),
+    }
+    subprocess.run(
+        [sys.executable, "manage.py", "migrate", "-v", "0"],
+        cwd=ROOT, env={**os.environ, **env}, check=True,
+    )
+    context = multiprocessing.get_context("spawn")
+    seeder = context.Process(target=seed, args=(env,))
+    seeder.start()
+    seeder.join()
+
+    results = context.Queue()
+    processes = [
+        context.Process(target=write_orders, args=(env, seconds, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    committed = sum(result[0] for result in totals)
+    locked = sum(result[1] for result in totals)
+    return committed / seconds, locked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'workers':>7} {'orders/s':>9} {'lock errors':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in ("default", "tuned"):
+            rate, locked = run(mode, args.workers, args.seconds, directory)
+            print(f"{mode:<8} {args.workers:>7} {rate:>9.1f} {locked:>12}")
+
+
+if __name__ == "__main__":
+    main()
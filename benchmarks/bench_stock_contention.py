@@ -0,0 +1,104 @@
+"""
+Contention benchmark: single-row stock updates vs. sharded stock counters.
+
+Usage:
+    python benchmarks/bench_stock_contention.py [--workers 8] [--seconds 5] [--shards 8]
+
+Worker processes deduct one unit at a time from the same inventory item
+through orders.stock.adjust_stock, each deduction in its own transaction,
+first with the stock in a single row and then spread over counter shards.
+Runs against a fresh tuned SQLite file. SQLite serialises all writers on a
+database-wide lock, so there the benchmark measures the overhead of the
+sharded path; the throughput gain only appears on databases with row-level
+locking, where the single row's lock is the bottleneck.
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT
+
+BASE_ENV = {
+    "DJANGO_SETTINGS_MODULE": "core.settings",
+    "AUTH0_DOMAIN": "example.auth0.com",
+    "AUTH0_AUDIENCE": "benchmark",
+    "SQLITE_TUNED": "True",
+}
+
+
+def setup_worker(env):
+    os.environ.update(env)
+    sys.path.insert(0, str(ROOT))
+    import django
+    django.setup()
+
+
+def seed(env, shards):
+    setup_worker(env)
+    from orders.models import Inventory
+    from orders.stock import rebalance_stock
+
+    inventory = Inventory.objects.create(name="Hot item", on_hand=10**9)
+    inventory.counter_shards = shards
+    rebalance_stock(inventory)
+
+
+def deduct(env, seconds, results):
+    setup_worker(env)
+    from django.db import transaction
+    from orders.models import Inventory
+    from orders.stock import adjust_stock
+
+    inventory = Inventory.objects.get(name="Hot item")
+    done = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        with transaction.atomic():
+            adjust_stock(inventory, -1)
+        done += 1
+    results.put(done)
+
+
+def run(shards, workers, seconds, directory):
+    env = {**BASE_ENV, "SQLITE_PATH": os.path.join(directory, f"stock_{shards}.sqlite3")}
+    subprocess.run(
+        [sys.executable, "manage.py", "migrate", "-v", "0"],
+        cwd=ROOT, env={**os.environ, **env}, check=True,
+    )
+    context = multiprocessing.get_context("spawn")
+    seeder = context.Process(target=seed, args=(env, shards))
+    seeder.start()
+    seeder.join()
+
+    results = context.Queue()
+    processes = [context.Process(target=deduct, args=(env, seconds, results)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--shards", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'counter':<10} {'workers':>7} {'deductions/s':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        for shards in (0, args.shards):
+            label = "single" if shards == 0 else f"{shards} shards"
+            rate = run(shards, args.workers, args.seconds, directory)
+            print(f"{label:<10} {args.workers:>7} {rate:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Webhook dispatch throughput against a local stub receiver.
+
+Usage:
+    python benchmarks/bench_webhooks.py [--deliveries 500] [--latency-ms 20] [--workers 1,8,32]
+
+Queues deliveries to a threaded HTTP/1.1 stub that answers every request
+after a fixed delay (standing in for a partner's processing time), then
+times orders.webhooks.dispatch_webhooks with each worker count. One worker
+shows the cost of sending serially; the pooled session keeps connections
+alive across deliveries in every run.
+"""
+
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import setup_django
+
+
+def start_stub(latency):
+    class Receiver(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(latency)
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Receiver)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--deliveries", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--workers", default="1,8,32")
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    server = start_stub(args.latency_ms / 1000)
+    try:
+        from orders.models import WebhookDelivery, WebhookEndpoint
+        from orders.webhooks import dispatch_webhooks
+
+        endpoint = WebhookEndpoint.objects.create(
+            url=f"http://127.0.0.1:{server.server_port}/hook", secret="benchmark"
+        )
+        payload = {"type": "UPDATE_ORDER", "data": {"id": 1, "order": 1, "action": "UPDATE_ORDER"}}
+        print(f"{'workers':>8} {'deliveries':>11} {'seconds':>8} {'per second':>11}")
+        for workers in [int(count) for count in args.workers.split(",")]:
+            WebhookDelivery.objects.all().delete()
+            WebhookDelivery.objects.bulk_create(
+                WebhookDelivery(endpoint=endpoint, event="UPDATE_ORDER", payload=payload)
+                for _ in range(args.deliveries)
+            )
+            start = time.perf_counter()
+            counts = dispatch_webhooks(workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers:>8} {counts['delivered']:>11} {elapsed:>8.2f} {counts['delivered'] / elapsed:>11.0f}")
+    finally:
+        server.shutdown()
+        teardown()
+
+
+if __name__ == "__main__":
+    main()
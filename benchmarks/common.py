@@ -0,0 +1,50 @@
+"""
+Shared setup for the benchmark scripts.
+
+Each script boots Django with the project settings and runs against a
+throwaway test database, so benchmarks never touch db.sqlite3.
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """
+    Configures Django and creates a fresh test database.
+
+    Returns:
+        callable: Teardown function destroying the test database.
+    """
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    os.environ.setdefault("AUTH0_DOMAIN", "example.auth0.com")
+    os.environ.setdefault("AUTH0_AUDIENCE", "benchmark")
+    os.environ.setdefault("LOAD_SHEDDING_ENABLED", "False")
+    os.environ.setdefault("SMS_PROVIDER", "null")
+
+    import django
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    return lambda: connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timed(func, repeat=3):
+    """
+    Returns the best wall-clock time in seconds of `repeat` calls to func.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
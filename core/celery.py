@@ -0,0 +1,21 @@
+"""
+Celery application for background and scheduled tasks.
+
+Start a worker with the beat scheduler embedded:
+
+    celery -A core worker --beat -l info
+
+Tasks are discovered from each app's tasks.py. The app is not imported from
+core/__init__.py: web processes only run tasks through beat, so they do not
+need to load Celery at startup.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+app = Celery("core")
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
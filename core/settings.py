@@ -80,6 +80,16 @@ API_IDENTIFIER = config("AUTH0_AUDIENCE")  # same as Audience in Auth0 API setti
 
 AFRICASTALKING_USERNAME = os.getenv("AT_USERNAME", "sandbox")
 AFRICASTALKING_API_KEY = os.getenv("AT_API_KEY", "")
+# SMS provider (orders.sms): "africastalking", "memory", "null" or a dotted path.
+SMS_PROVIDER = os.getenv("SMS_PROVIDER", "africastalking")
+# Timeouts and circuit breaker around remote SMS providers (orders.sms).
+SMS = {
+    "ENDPOINT": os.getenv("AT_SMS_ENDPOINT"),
+    "CONNECT_TIMEOUT": float(os.getenv("SMS_CONNECT_TIMEOUT", "3")),
+    "READ_TIMEOUT": float(os.getenv("SMS_READ_TIMEOUT", "5")),
+    "FAILURE_THRESHOLD": int(os.getenv("SMS_FAILURE_THRESHOLD", "5")),
+    "RESET_SECONDS": int(os.getenv("SMS_CIRCUIT_RESET_SECONDS", "30")),
+}
 
 
 
@@ -88,15 +98,102 @@ REST_FRAMEWORK = {
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    "DEFAULT_THROTTLE_CLASSES": (
+        "orders.throttling.UserTokenBucketThrottle",
+        "orders.throttling.AnonTokenBucketThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "user": os.getenv("THROTTLE_USER_RATE", "600/min"),
+        "anon": os.getenv("THROTTLE_ANON_RATE", "120/min"),
+        "register": os.getenv("THROTTLE_REGISTER_RATE", "10/hour"),
+    },
+}
+
+# Throttle buckets and other shared counters live in the cache, so it must be
+# shared by all workers in production (set REDIS_URL).
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Lifetime of the ETag version tokens (orders.conditional). Conditional
+# responses are only served when the cache above is shared by all workers.
+ETAG_VERSION_TTL = int(os.getenv("ETAG_VERSION_TTL", str(24 * 60 * 60)))
+
+# How long the summed stock of sharded inventory items is cached.
+STOCK_TOTAL_CACHE_SECONDS = int(os.getenv("STOCK_TOTAL_CACHE_SECONDS", "5"))
+
+# Low-stock alerts (see orders.alerts): channels are "sms", "webhook", "log".
+STOCK_ALERT_CHANNELS = [c for c in os.getenv("STOCK_ALERT_CHANNELS", "log").split(",") if c]
+STOCK_ALERT_SMS_RECIPIENTS = [p for p in os.getenv("STOCK_ALERT_SMS_RECIPIENTS", "").split(",") if p]
+STOCK_ALERT_WEBHOOK_URL = os.getenv("STOCK_ALERT_WEBHOOK_URL")
+STOCK_ALERT_DEBOUNCE_SECONDS = int(os.getenv("STOCK_ALERT_DEBOUNCE_SECONDS", "900"))
+
+# Abandoned DRAFT orders are cancelled after this many hours (orders.expiry).
+DRAFT_ORDER_TTL_HOURS = float(os.getenv("DRAFT_ORDER_TTL_HOURS", "72"))
+
+# Celery (core.celery): broker and periodic tasks run by `celery -A core worker --beat`.
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", REDIS_URL or "memory://")
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_BEAT_SCHEDULE = {
+    "expire-draft-orders": {
+        "task": "orders.tasks.expire_draft_orders",
+        "schedule": int(os.getenv("EXPIRE_DRAFTS_EVERY_SECONDS", "3600")),
+    },
+}
+
+# Outbound webhooks (orders.webhooks), sent by `manage.py dispatch_webhooks`.
+WEBHOOKS = {
+    "WORKERS": int(os.getenv("WEBHOOK_WORKERS", "8")),
+    "MAX_ATTEMPTS": int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8")),
+    "FAILURE_THRESHOLD": int(os.getenv("WEBHOOK_FAILURE_THRESHOLD", "5")),
+    "CIRCUIT_RESET_SECONDS": int(os.getenv("WEBHOOK_CIRCUIT_RESET_SECONDS", "300")),
+}
+
+# Order change feed (orders.events): how often the shared poller looks for
+# new transactions, how long it waits for ids committed out of order, and
+# the keep-alive interval for idle streams.
+ORDER_EVENTS_POLL_SECONDS = float(os.getenv("ORDER_EVENTS_POLL_SECONDS", "1"))
+ORDER_EVENTS_GAP_SECONDS = int(os.getenv("ORDER_EVENTS_GAP_SECONDS", "60"))
+ORDER_EVENTS_HEARTBEAT_SECONDS = int(os.getenv("ORDER_EVENTS_HEARTBEAT_SECONDS", "15"))
+
+# Request profiling (orders.middleware.RequestProfilingMiddleware): profile a
+# fraction of requests, or those sending the X-Profile-Token header with
+# PROFILING_TOKEN. Summarise with `manage.py profile_summary`.
+PROFILING = {
+    "SAMPLE_RATE": float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+    "TOKEN": os.getenv("PROFILING_TOKEN", ""),
+    "DIRECTORY": os.getenv("PROFILING_DIRECTORY", str(BASE_DIR / "profiles")),
+    "MAX_FILES": int(os.getenv("PROFILING_MAX_FILES", "200")),
+}
+
+# Priority-aware load shedding, see orders.middleware.LoadSheddingMiddleware.
+LOAD_SHEDDING = {
+    "ENABLED": os.getenv("LOAD_SHEDDING_ENABLED", "True") == "True",
+    "MAX_IN_FLIGHT": int(os.getenv("LOAD_SHEDDING_MAX_IN_FLIGHT", "32")),
+    "DB_LATENCY_MS": int(os.getenv("LOAD_SHEDDING_DB_LATENCY_MS", "250")),
 }
 
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'orders.middleware.LoadSheddingMiddleware',
+    'orders.middleware.RequestProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'orders.middleware.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -129,10 +226,57 @@ WSGI_APPLICATION = 'core.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.getenv("SQLITE_PATH", BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Opt-in SQLite tuning for running several workers against one database file.
+# WAL lets readers proceed alongside the single writer, IMMEDIATE transactions
+# take the write lock up front (so concurrent writers wait on the busy timeout
+# instead of failing with "database is locked" on lock upgrade), and
+# synchronous=NORMAL is durable under WAL except on power loss.
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "False") == "True"
+SQLITE_TUNED_OPTIONS = {
+    "timeout": 20,
+    "transaction_mode": "IMMEDIATE",
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA mmap_size=134217728;"
+        "PRAGMA cache_size=-20000;"
+        "PRAGMA temp_store=MEMORY"
+    ),
+}
+if SQLITE_TUNED:
+    DATABASES['default']['OPTIONS'] = SQLITE_TUNED_OPTIONS
+
+# Read replicas: comma-separated SQLite files kept in sync with the primary
+# (see `manage.py sync_replicas`). Safe reads are routed to them, and users
+# are pinned to the primary for REPLICA_PIN_SECONDS after a write.
+DATABASE_REPLICAS = []
+for index, path in enumerate(filter(None, os.getenv("SQLITE_REPLICA_PATHS", "").split(","))):
+    alias = f"replica_{index}"
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': path.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+# Optional customer-keyed sharding of orders, items and transactions across
+# ORDER_SHARD_COUNT SQLite files next to the primary (see orders.sharding).
+ORDER_SHARDS = []
+for index in range(int(os.getenv("ORDER_SHARD_COUNT", "0"))):
+    alias = f"shard_{index}"
+    primary = Path(DATABASES['default']['NAME'])
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': primary.with_name(f"{primary.stem}_shard_{index}{primary.suffix}"),
+    }
+    ORDER_SHARDS.append(alias)
+
+DATABASE_ROUTERS = [
+    "orders.sharding.OrderShardRouter",
+    "orders.db_routers.PrimaryReplicaRouter",
+]
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
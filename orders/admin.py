@@ -1,3 +1,291 @@
-from django.contrib import admin
+"""
+Admin registrations for the orders app, built for large tables.
 
-# Register your models here.
+Changelists never run an exact COUNT(*) over big tables (see
+EstimatedCountPaginator), load related rows with the page query
+(list_select_related), edit foreign keys with raw-id or autocomplete widgets
+instead of rendering every row into a <select>, and only offer list filters
+backed by an index. Bulk actions run as set-based updates and keep caches,
+ETags and audit transactions in step like the API does.
+
+With order sharding enabled, the order, order item and transaction admins
+show the default database only.
+"""
+
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .expiry import cancel_orders
+from .models import (
+    Customer,
+    Inventory,
+    InventoryStockShard,
+    Order,
+    OrderItem,
+    StockAlert,
+    Transaction,
+    WebhookDelivery,
+    WebhookEndpoint,
+)
+from .stock import set_stock
+from .webhooks import invalidate_endpoints
+
+
+def estimate_row_count(model, using):
+    """
+    Returns a cheap estimate of a table's row count: the planner statistics
+    on PostgreSQL, the highest primary key elsewhere (an index lookup).
+    """
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE relname = %s", [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    return model._default_manager.using(using).aggregate(top=Max("pk"))["top"] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never counts more than `count_limit` rows: unfiltered
+    lists of large tables use an estimate, filtered lists count at most
+    `count_limit` rows from the start of the requested `page` (a bounded
+    subquery). The page links therefore always reach `count_limit` rows past
+    the current page, so every page of a long filtered list is reachable.
+    """
+    count_limit = 10000
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True, page=1):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        try:
+            self.offset = max(int(page) - 1, 0) * self.per_page
+        except (TypeError, ValueError):
+            self.offset = 0
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate > self.count_limit:
+                return estimate
+        return self.offset + queryset.order_by()[self.offset:self.offset + self.count_limit].count()
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin defaults for tables that may grow to millions of rows.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page, page=request.GET.get(PAGE_VAR, 1)
+        )
+
+
+class PendingFilter(admin.SimpleListFilter):
+    """
+    Filters queue rows on `processed_at`, the leading column of their
+    pending-items index.
+    """
+    title = "status"
+    parameter_name = "status"
+
+    def lookups(self, request, model_admin):
+        return [("pending", "Pending"), ("processed", "Processed")]
+
+    def queryset(self, request, queryset):
+        if self.value() in ("pending", "processed"):
+            return queryset.filter(processed_at__isnull=self.value() == "pending")
+        return queryset
+
+
+class DeliveryStatusFilter(admin.SimpleListFilter):
+    title = "status"
+    parameter_name = "status"
+
+    def lookups(self, request, model_admin):
+        return [("pending", "Pending"), ("delivered", "Delivered"), ("failed", "Failed")]
+
+    def queryset(self, request, queryset):
+        if self.value() == "pending":
+            return queryset.filter(delivered_at__isnull=True, failed_at__isnull=True)
+        if self.value() == "delivered":
+            return queryset.filter(delivered_at__isnull=False)
+        if self.value() == "failed":
+            return queryset.filter(delivered_at__isnull=True, failed_at__isnull=False)
+        return queryset
+
+
+@admin.register(Customer)
+class CustomerAdmin(ScalableModelAdmin):
+    list_display = ("id", "name", "code", "phone_number", "user")
+    list_select_related = ("user",)
+    # Exact matches on the unique (indexed) columns.
+    search_fields = ("=code", "=phone_number")
+    raw_id_fields = ("user",)
+    ordering = ("-id",)
+
+
+class InventoryStockShardInline(admin.TabularInline):
+    model = InventoryStockShard
+    fields = ("index", "on_hand")
+    readonly_fields = ("index", "on_hand")
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Inventory)
+class InventoryAdmin(ScalableModelAdmin):
+    list_display = ("id", "name", "on_hand", "warn_limit", "counter_shards", "created_at")
+    search_fields = ("^name",)
+    ordering = ("name",)
+    inlines = [InventoryStockShardInline]
+
+    def save_model(self, request, obj, form, change):
+        """
+        Applies stock changes through orders.stock, so concurrent deductions
+        are not overwritten and sharded items are redistributed.
+        """
+        if not change or "on_hand" not in form.changed_data:
+            return super().save_model(request, obj, form, change)
+        quantity = obj.on_hand
+        obj.on_hand = form.initial["on_hand"]
+        fields = [name for name in form.changed_data if name != "on_hand"]
+        if fields:
+            obj.save(update_fields=fields)
+        set_stock(obj, quantity)
+
+
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    raw_id_fields = ("inventory",)
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("inventory")
+
+
+@admin.register(Order)
+class OrderAdmin(ScalableModelAdmin):
+    list_display = ("id", "customer", "state", "created_at")
+    list_select_related = ("customer",)
+    # Served by the (state, created_at) index.
+    list_filter = ("state",)
+    autocomplete_fields = ("customer",)
+    ordering = ("-id",)
+    inlines = [OrderItemInline]
+    actions = ["cancel_selected"]
+
+    @admin.action(description="Cancel selected draft/placed orders (customers are notified)")
+    def cancel_selected(self, request, queryset):
+        using = queryset.db
+        with transaction.atomic(using=using):
+            rows = list(
+                queryset.select_for_update()
+                .filter(state__in=["DRAFT", "PLACED"])
+                .order_by()
+                .values_list("id", "customer_id", "state")
+            )
+            cancel_orders(rows, using, f"cancelled by {request.user}", notify_customers=True)
+        self.message_user(request, f"Cancelled {len(rows)} order(s).", messages.SUCCESS)
+
+
+@admin.register(OrderItem)
+class OrderItemAdmin(ScalableModelAdmin):
+    list_display = ("id", "order", "inventory", "quantity", "price_at_order")
+    list_select_related = ("order__customer", "inventory")
+    raw_id_fields = ("order", "inventory")
+    ordering = ("-id",)
+
+
+@admin.register(Transaction)
+class TransactionAdmin(ScalableModelAdmin):
+    """
+    Read-only view of the audit log.
+    """
+    list_display = ("id", "order_id", "customer", "action", "timestamp")
+    list_select_related = ("customer",)
+    # Served by the (action, timestamp) index.
+    list_filter = ("action",)
+    raw_id_fields = ("order", "customer")
+    ordering = ("-id",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StockAlert)
+class StockAlertAdmin(ScalableModelAdmin):
+    list_display = ("id", "inventory", "level", "on_hand", "created_at", "processed_at")
+    list_select_related = ("inventory",)
+    list_filter = (PendingFilter,)
+    raw_id_fields = ("inventory",)
+    ordering = ("-id",)
+    actions = ["mark_processed"]
+
+    @admin.action(description="Mark selected alerts as processed")
+    def mark_processed(self, request, queryset):
+        updated = queryset.filter(processed_at__isnull=True).update(processed_at=timezone.now())
+        self.message_user(request, f"Marked {updated} alert(s) as processed.", messages.SUCCESS)
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(ScalableModelAdmin):
+    list_display = ("id", "url", "is_active", "failure_count", "opened_at", "last_success_at")
+    readonly_fields = ("failure_count", "opened_at", "last_success_at", "last_error")
+    ordering = ("id",)
+    actions = ["activate", "deactivate", "reset_circuit"]
+
+    def _update(self, request, queryset, message, **values):
+        updated = queryset.update(**values)
+        # update() sends no signals, so refresh the cached endpoint list here.
+        transaction.on_commit(invalidate_endpoints, using=queryset.db)
+        self.message_user(request, message % updated, messages.SUCCESS)
+
+    @admin.action(description="Activate selected endpoints")
+    def activate(self, request, queryset):
+        self._update(request, queryset, "Activated %d endpoint(s).", is_active=True)
+
+    @admin.action(description="Deactivate selected endpoints")
+    def deactivate(self, request, queryset):
+        self._update(request, queryset, "Deactivated %d endpoint(s).", is_active=False)
+
+    @admin.action(description="Close the circuit breaker of selected endpoints")
+    def reset_circuit(self, request, queryset):
+        self._update(request, queryset, "Reset %d endpoint(s).", failure_count=0, opened_at=None)
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(ScalableModelAdmin):
+    list_display = ("id", "endpoint", "event", "attempts", "next_attempt_at", "delivered_at", "failed_at")
+    list_select_related = ("endpoint",)
+    list_filter = (DeliveryStatusFilter,)
+    raw_id_fields = ("endpoint",)
+    ordering = ("-id",)
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry selected undelivered webhooks now")
+    def retry_now(self, request, queryset):
+        updated = queryset.filter(delivered_at__isnull=True).update(
+            next_attempt_at=timezone.now(), failed_at=None
+        )
+        self.message_user(request, f"Queued {updated} delivery(ies) for retry.", messages.SUCCESS)
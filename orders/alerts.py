@@ -0,0 +1,176 @@
+"""
+Low-stock alert engine.
+
+Stock mutations in orders.stock report each change's before/after levels
+(taken from the UPDATE itself, so detection costs no extra query). When a
+change crosses an item's warning limit or reaches zero, a StockAlert row is
+queued in the same transaction. Repeated alerts for the same item and level
+are debounced for STOCK_ALERT_DEBOUNCE_SECONDS.
+
+`dispatch_pending_alerts` consumes the queue in batches and notifies staff
+through the channels listed in STOCK_ALERT_CHANNELS ("sms", "webhook",
+"log"), one notification per batch rather than one per alert. An alert is
+only marked processed once every channel has sent it; channels that failed
+are retried on the next run without resending through the others.
+"""
+
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import constants
+from .models import StockAlert
+from .sms import get_sms_provider
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_KEY = "stock_alert:%s:%s"
+
+# Severity of each alert level; None is healthy stock.
+SEVERITY = {None: 0, "LOW_STOCK": 1, "OUT_OF_STOCK": 2}
+
+
+def alert_level(on_hand, warn_limit):
+    """
+    Returns the alert level for a stock level, or None if stock is healthy.
+    """
+    if on_hand <= 0:
+        return "OUT_OF_STOCK"
+    if on_hand <= warn_limit:
+        return "LOW_STOCK"
+    return None
+
+
+def record_stock_change(inventory_id, before, after, warn_limit, using=None):
+    """
+    Queues an alert if a stock change crossed into a worse alert level.
+
+    Args:
+        inventory_id (int): The item that changed.
+        before (int): Stock before the change.
+        after (int): Stock after the change.
+        warn_limit (int): The item's warning limit.
+        using (str | None): Database alias of the stock update's transaction.
+
+    Returns:
+        StockAlert | None: The queued alert, if any.
+    """
+    level = alert_level(after, warn_limit)
+    if SEVERITY[level] <= SEVERITY[alert_level(before, warn_limit)]:
+        return None
+
+    key = DEBOUNCE_KEY % (inventory_id, level)
+    if cache.get(key) is not None:
+        return None
+    alert = StockAlert.objects.using(using).create(
+        inventory_id=inventory_id, level=level, on_hand=after
+    )
+    transaction.on_commit(
+        lambda: cache.set(key, 1, getattr(settings, "STOCK_ALERT_DEBOUNCE_SECONDS", 900)),
+        using=using,
+    )
+    return alert
+
+
+def format_alerts(alerts):
+    """
+    Returns a single staff notification text for a batch of alerts.
+    """
+    lines = [
+        f"{alert.inventory.name}: {constants.STOCK_ALERT_LEVELS[alert.level].lower()} ({alert.on_hand} left)"
+        for alert in alerts
+    ]
+    return "Stock alerts: " + "; ".join(lines)
+
+
+def alert_payload(alert):
+    return {
+        "id": alert.id,
+        "inventory_id": alert.inventory_id,
+        "inventory_name": alert.inventory.name,
+        "level": alert.level,
+        "on_hand": alert.on_hand,
+        "created_at": alert.created_at.isoformat(),
+    }
+
+
+def notify_sms(alerts):
+    # The provider is called directly (not through send_sms, which swallows
+    # errors) so a failed or refused send leaves the alerts pending.
+    recipients = getattr(settings, "STOCK_ALERT_SMS_RECIPIENTS", [])
+    if recipients:
+        get_sms_provider().send(format_alerts(alerts), list(recipients))
+
+
+def notify_webhook(alerts):
+    url = getattr(settings, "STOCK_ALERT_WEBHOOK_URL", None)
+    if not url:
+        return
+    import requests
+
+    response = requests.post(
+        url,
+        json={"alerts": [alert_payload(alert) for alert in alerts]},
+        timeout=(3, 10),
+    )
+    response.raise_for_status()
+
+
+def notify_log(alerts):
+    logger.warning(format_alerts(alerts))
+
+
+CHANNELS = {
+    "sms": notify_sms,
+    "webhook": notify_webhook,
+    "log": notify_log,
+}
+
+
+def dispatch_pending_alerts(batch_size=100):
+    """
+    Sends one notification per channel for each batch of pending alerts,
+    and marks the alerts processed once every channel has sent them. If a
+    channel fails, the batch stays pending (remembering which channels
+    succeeded) and dispatching stops until the next run.
+
+    Returns:
+        int: Number of alerts processed.
+    """
+    channels = getattr(settings, "STOCK_ALERT_CHANNELS", ["log"])
+    dispatched = 0
+    while True:
+        alerts = list(
+            StockAlert.objects.filter(processed_at__isnull=True)
+            .select_related("inventory")
+            .order_by("id")[:batch_size]
+        )
+        if not alerts:
+            return dispatched
+        failed = False
+        for name in channels:
+            unsent = [alert for alert in alerts if name not in alert.sent_channels]
+            if not unsent:
+                continue
+            try:
+                CHANNELS[name](unsent)
+            except Exception:
+                logger.exception("Stock alert channel %r failed", name)
+                failed = True
+                continue
+            for alert in unsent:
+                alert.sent_channels = [*alert.sent_channels, name]
+
+        processed_at = timezone.now()
+        done = []
+        for alert in alerts:
+            if set(channels) <= set(alert.sent_channels):
+                alert.processed_at = processed_at
+                done.append(alert)
+        StockAlert.objects.bulk_update(alerts, ["sent_channels", "processed_at"])
+        dispatched += len(done)
+        if failed:
+            return dispatched
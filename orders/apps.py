@@ -6,4 +6,5 @@ class OrdersConfig(AppConfig):
     name = 'orders'
     
     def ready(self):
+        import orders.checks
         import orders.signals
@@ -0,0 +1,41 @@
+"""
+System checks for the orders app.
+
+Throttle buckets, ETag versions and the cached webhook endpoint list live
+in the default cache, and are only consistent across workers if that cache
+is shared between processes. LocMemCache (the fallback when REDIS_URL is
+unset) is private to each process, so outside DEBUG the orders.E001 check
+refuses it. Single-process deployments can silence the check with
+SILENCED_SYSTEM_CHECKS = ["orders.E001"].
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def cache_is_shared(alias="default"):
+    """
+    Returns whether the cache `alias` is visible to every worker process.
+    """
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if settings.DEBUG or cache_is_shared():
+        return []
+    return [
+        Error(
+            "The default cache is local to each process.",
+            hint=(
+                "Throttles, ETags and the webhook endpoint list need a "
+                "cache shared by all workers; set REDIS_URL."
+            ),
+            id="orders.E001",
+        )
+    ]
@@ -0,0 +1,173 @@
+"""
+Conditional GET support (ETag / Last-Modified) for API resources.
+
+Each cacheable resource belongs to one or more version scopes, e.g.
+"inventory" or "orders:user:<id>". A scope's version is a random token plus
+the time it was last changed, kept in the cache and replaced whenever the
+underlying rows change. ETags are derived from the scope versions and the
+request URL, so a matching If-None-Match can be answered with 304 before any
+query or serializer runs.
+
+Versions expire after ETAG_VERSION_TTL seconds (a day by default); an
+expired scope simply gets a new version, costing clients one full response.
+A bump is only seen by other workers through a shared cache, so conditional
+responses are disabled while the default cache is per-process (see
+orders.checks).
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from .checks import cache_is_shared
+
+VERSION_KEY = "resource_version:%s"
+
+INVENTORY_SCOPE = "inventory"
+# Only renames: order payloads embed the inventory name, not its stock.
+INVENTORY_NAMES_SCOPE = "inventory:names"
+
+
+def orders_scope(user_id):
+    """
+    Returns the version scope covering one user's orders.
+    """
+    return f"orders:user:{user_id}"
+
+
+def _new_version():
+    return (uuid.uuid4().hex, timezone.now().timestamp())
+
+
+def version_ttl():
+    return getattr(settings, "ETAG_VERSION_TTL", 24 * 60 * 60)
+
+
+def bump_version(*scopes, using=None):
+    """
+    Marks the given scopes as changed once the current transaction on the
+    `using` database commits, so readers never see a new version paired
+    with uncommitted data.
+    """
+    def bump():
+        cache.set_many({VERSION_KEY % scope: _new_version() for scope in scopes}, version_ttl())
+
+    transaction.on_commit(bump, using=using)
+
+
+class PendingOrderVersions:
+    """
+    Customers and orders whose order scopes change when a transaction
+    commits. Their user ids are looked up together at commit time.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.customer_ids = set()
+        self.order_ids = set()
+        self.flushed = False
+
+    def flush(self):
+        from .models import Customer, Order
+
+        if self.flushed:
+            return
+        self.flushed = True
+        customer_ids = set(self.customer_ids)
+        if self.order_ids:
+            customer_ids.update(
+                Order.objects.using(self.using)
+                .filter(pk__in=self.order_ids)
+                .values_list("customer_id", flat=True)
+            )
+        if not customer_ids:
+            return
+        user_ids = (
+            Customer.objects.db_manager(router.db_for_write(Customer))
+            .filter(pk__in=customer_ids)
+            .values_list("user_id", flat=True)
+        )
+        cache.set_many({VERSION_KEY % orders_scope(user_id): _new_version() for user_id in user_ids}, version_ttl())
+
+
+def bump_orders_version(using=None, customer_id=None, order_id=None):
+    """
+    Marks the orders of a customer, given by `customer_id` or by one of
+    their orders' `order_id`, as changed once the transaction on `using`
+    commits. Ids are collected per transaction and resolved to user ids with
+    a single query by the first commit callback to run, so saving many
+    orders or items in one transaction costs one lookup rather than one or
+    two per save. Ids from rolled-back savepoints may still be bumped, which
+    only costs clients a full response.
+    """
+    connection = transaction.get_connection(using)
+    pending = getattr(connection, "pending_order_versions", None)
+    if pending is None or pending.flushed:
+        pending = connection.pending_order_versions = PendingOrderVersions(connection.alias)
+    if customer_id is not None:
+        pending.customer_ids.add(customer_id)
+    if order_id is not None:
+        pending.order_ids.add(order_id)
+    transaction.on_commit(pending.flush, using=connection.alias)
+
+
+def get_versions(scopes):
+    """
+    Returns {scope: (token, timestamp)} for the given scopes, initialising any
+    scope that has no version yet.
+    """
+    keys = {VERSION_KEY % scope: scope for scope in scopes}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, _new_version(), version_ttl())
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin adding strong ETag and Last-Modified headers to `list` and
+    `retrieve`, and answering matching conditional requests with 304.
+
+    Views define `get_version_scopes()` returning the scopes their responses
+    depend on.
+    """
+
+    def get_version_scopes(self):
+        raise NotImplementedError(".get_version_scopes() must be overridden")
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def conditional_response(self, handler, request, *args, **kwargs):
+        if not cache_is_shared():
+            # Other workers would not see version bumps and keep answering
+            # 304 to stale ETags.
+            return handler(request, *args, **kwargs)
+        versions = get_versions(self.get_version_scopes())
+        fingerprint = repr((
+            sorted(token for token, _ in versions.values()),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+        ))
+        etag = '"%s"' % hashlib.md5(fingerprint.encode()).hexdigest()
+        last_modified = int(max(timestamp for _, timestamp in versions.values()))
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ("Accept", "Authorization"))
+        return response
@@ -1,3 +1,5 @@
+import contextlib
+
 import pytest
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
@@ -46,3 +48,84 @@ def auth_client():
     client = APIClient()
     client.force_authenticate(user=user)
     return client
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Reset cache-backed state (throttle buckets, counters) between tests."""
+    from django.core.cache import cache
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def sms_outbox(settings):
+    """Send SMS through the in-memory provider; returns its outbox."""
+    from orders.sms import get_sms_provider
+    settings.SMS_PROVIDER = "memory"
+    return get_sms_provider().outbox
+
+
+@pytest.fixture
+def shared_cache(settings, tmp_path):
+    """
+    Use a cache shared between processes (file-based), as features such as
+    conditional responses require outside single-process setups.
+    """
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": str(tmp_path / "cache"),
+        }
+    }
+
+
+@pytest.fixture
+def django_capture_on_commit_callbacks():
+    """
+    pytest-django's fixture, capturing the on-commit callbacks of every
+    database by default, so tests also cover order shards (ORDER_SHARD_COUNT).
+    """
+    from django.db import connections
+    from django.test import TestCase
+
+    @contextlib.contextmanager
+    def capture(*, using=None, execute=False):
+        callbacks = []
+        captured = []
+        try:
+            with contextlib.ExitStack() as stack:
+                for alias in [using] if using else list(connections):
+                    captured.append(stack.enter_context(
+                        TestCase.captureOnCommitCallbacks(using=alias, execute=execute)
+                    ))
+                yield callbacks
+        finally:
+            for alias_callbacks in captured:
+                callbacks.extend(alias_callbacks)
+
+    return capture
+
+
+@pytest.fixture
+def django_assert_num_queries():
+    """
+    pytest-django's fixture, counting the queries of every database, so
+    query budgets hold when order data lives on shards (ORDER_SHARD_COUNT).
+    """
+    from django.db import connections
+    from django.test.utils import CaptureQueriesContext
+
+    @contextlib.contextmanager
+    def assert_num_queries(num, info=None):
+        with contextlib.ExitStack() as stack:
+            contexts = [stack.enter_context(CaptureQueriesContext(conn)) for conn in connections.all()]
+            yield contexts
+        queries = [query["sql"] for context in contexts for query in context.captured_queries]
+        message = f"Expected to perform {num} queries but {len(queries)} were done"
+        if info:
+            message += f"\n{info}"
+        assert len(queries) == num, "\n".join([message, *queries])
+
+    return assert_num_queries
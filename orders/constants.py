@@ -27,3 +27,9 @@ INVENTORY_STATUS = {
     "FEW_REMAINING": "Few remaining",
     "OUT_OF_STOCK": "Out of stock",
 }
+
+# Stock alert levels
+STOCK_ALERT_LEVELS = {
+    "LOW_STOCK": "Low stock",
+    "OUT_OF_STOCK": "Out of stock",
+}
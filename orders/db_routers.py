@@ -0,0 +1,121 @@
+"""
+Database routing between the primary database and read replicas.
+
+Reads go to a randomly chosen replica, except:
+- reads inside a transaction, which must see the transaction's own writes;
+- reads by a user who wrote recently, who is pinned to the primary for
+  REPLICA_PIN_SECONDS so they never read their own writes stale.
+
+Writes always go to the primary. The router does nothing unless
+DATABASE_REPLICAS lists at least one replica alias.
+"""
+
+import contextvars
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+PIN_KEY = "replica_pin:%s"
+
+_request_state = contextvars.ContextVar("replica_request_state", default=None)
+
+
+class RequestRoutingState:
+    """
+    Routing state for the request being handled in the current context.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self.pinned = False
+        self.pin_checked = False
+
+    def is_pinned(self):
+        """
+        Returns whether reads must go to the primary. The pin is looked up
+        in the cache at most once per request, once the user is known.
+        """
+        if self.wrote or self.pinned:
+            return True
+        if self.pin_checked:
+            return False
+        user = getattr(self.request, "user", None)
+        # Do not force the lazy session user: loading it is itself a read.
+        if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+            return False
+        if user.is_authenticated:
+            self.pinned = cache.get(PIN_KEY % user.pk) is not None
+            self.pin_checked = True
+        return self.pinned
+
+
+def get_replicas():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+def begin_request(request):
+    """
+    Starts tracking routing state for a request. Returns a token for
+    `end_request`.
+    """
+    return _request_state.set(RequestRoutingState(request))
+
+
+def end_request(token):
+    """
+    Stops tracking the current request, pinning its user to the primary if
+    the request wrote to the database.
+    """
+    state = _request_state.get()
+    _request_state.reset(token)
+    if state is None or not state.wrote:
+        return
+    user = getattr(state.request, "user", None)
+    if user is not None and user.is_authenticated:
+        cache.set(PIN_KEY % user.pk, 1, getattr(settings, "REPLICA_PIN_SECONDS", 5))
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to the primary and safe reads to the replicas.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas:
+            return None
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        state = _request_state.get()
+        if state is not None and state.is_pinned():
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if not get_replicas():
+            return None
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not get_replicas():
+            return None
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and are never migrated directly.
+        if db in get_replicas():
+            return False
+        return None
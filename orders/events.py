@@ -0,0 +1,244 @@
+"""
+Server-Sent Events change feed of order transactions.
+
+`GET /api/orders/events/` streams the authenticated customer's `Transaction`
+events as SSE, each with `id: <transaction id>`, so clients reconnecting with
+a `Last-Event-ID` header resume where they left off instead of polling the
+order list.
+
+Each process runs one `ChangeFeed` poller that reads new transactions (one
+query per poll interval and database, however many clients are connected)
+and fans them out to the connected customers' queues. Transaction ids are
+unique across shards but only increase within one shard's id range, so the
+poller follows each shard's own range, and a reconnecting client resumes
+after the position (timestamp, id) of its last event rather than its id.
+
+Ids are allocated when a row is inserted but become visible when its
+transaction commits, so on databases with concurrent writers (PostgreSQL) a
+lower id can appear after a higher one was polled. The poller remembers the
+ids missing below its cursor and looks for them again on every poll for
+ORDER_EVENTS_GAP_SECONDS; a transaction that stays open for longer than
+that is only delivered through the backlog when its client reconnects.
+The endpoint must be served by the ASGI application (core.asgi); under WSGI
+a streaming response would tie up a worker per client.
+"""
+
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework import permissions
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.views import APIView
+
+from .fast_reads import TRANSACTION_FIELDS, Column, render_rows
+from .models import Customer, Transaction
+from .sharding import customer_db, id_range, order_databases
+
+EVENT_FIELDS = {**TRANSACTION_FIELDS, "customer_id": Column("order__customer_id")}
+
+
+def format_event(event):
+    """
+    Returns one SSE message for a transaction row.
+    """
+    payload = {name: event[name] for name in TRANSACTION_FIELDS}
+    return f"id: {event['id']}\nevent: {event['action']}\ndata: {json.dumps(payload)}\n\n"
+
+
+class ChangeFeed:
+    """
+    Shared poller fanning new transactions out to subscribed customers.
+
+    Subscribers get an asyncio.Queue of event dicts. A subscriber whose
+    queue overflows is sent None and dropped; its client reconnects with
+    Last-Event-ID and catches up from the backlog.
+    """
+    queue_size = 1000
+    # Gaps wider than this (e.g. a sequence jump) are not waited for.
+    max_gap = 1000
+
+    def __init__(self):
+        self.subscribers = {}
+        self.cursors = {}
+        # alias -> {missing id below the cursor: when it was first missed}
+        self.gaps = {}
+        self.task = None
+
+    def poll_interval(self):
+        return getattr(settings, "ORDER_EVENTS_POLL_SECONDS", 1)
+
+    def gap_seconds(self):
+        return getattr(settings, "ORDER_EVENTS_GAP_SECONDS", 60)
+
+    def subscribe(self, customer_id):
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers.setdefault(customer_id, set()).add(queue)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self.run())
+        return queue
+
+    def unsubscribe(self, customer_id, queue):
+        queues = self.subscribers.get(customer_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[customer_id]
+
+    def publish(self, events):
+        for event in events:
+            for queue in list(self.subscribers.get(event["customer_id"], ())):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    self.unsubscribe(event["customer_id"], queue)
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+
+    async def run(self):
+        fetch = sync_to_async(self.fetch, thread_sensitive=False)
+        self.cursors = await sync_to_async(self.latest_ids, thread_sensitive=False)()
+        while self.subscribers:
+            await asyncio.sleep(self.poll_interval())
+            self.publish(await fetch())
+
+    @staticmethod
+    def new_rows(alias):
+        """
+        Returns the transactions `alias` allocates ids for: its own id range
+        on a shard (rows moved in by resharding keep ids from other ranges).
+        """
+        queryset = Transaction.objects.using(alias)
+        bounds = id_range(alias)
+        return queryset.filter(id__range=bounds) if bounds else queryset
+
+    def latest_ids(self):
+        close_old_connections()
+        return {
+            alias: self.new_rows(alias).order_by("-id").values_list("id", flat=True).first() or 0
+            for alias in order_databases()
+        }
+
+    def fetch(self):
+        """
+        Returns transactions committed since the last poll, on every
+        database holding order data: rows above the cursor, and rows that
+        fill a gap left below it.
+        """
+        close_old_connections()
+        now = time.monotonic()
+        events = []
+        for alias in order_databases():
+            cursor = self.cursors.get(alias, 0)
+            gaps = {
+                pk: seen for pk, seen in self.gaps.get(alias, {}).items()
+                if now - seen < self.gap_seconds()
+            }
+            condition = Q(id__gt=cursor)
+            if gaps:
+                condition |= Q(id__in=list(gaps))
+            rows = render_rows(self.new_rows(alias).filter(condition).order_by("id"), EVENT_FIELDS)
+            previous = cursor
+            for row in rows:
+                gaps.pop(row["id"], None)
+                if row["id"] <= cursor:
+                    continue
+                if previous and row["id"] - previous <= self.max_gap:
+                    gaps.update(dict.fromkeys(range(previous + 1, row["id"]), now))
+                previous = row["id"]
+            self.cursors[alias] = previous
+            self.gaps[alias] = gaps
+            events.extend(rows)
+        return events
+
+    def backlog(self, customer, after_id, limit=1000):
+        """
+        Returns the customer's transactions after the one with id
+        `after_id`, in (timestamp, id) order.
+        """
+        transactions = Transaction.objects.using(customer_db(customer)).filter(order__customer=customer)
+        after = transactions.filter(pk=after_id).values_list("timestamp", flat=True).first()
+        if after is None:
+            after_rows = transactions.filter(id__gt=after_id)
+        else:
+            after_rows = transactions.filter(Q(timestamp__gt=after) | Q(timestamp=after, id__gt=after_id))
+        return render_rows(after_rows.order_by("timestamp", "id")[:limit], EVENT_FIELDS)
+
+
+feed = ChangeFeed()
+
+
+async def event_stream(customer, last_event_id, change_feed=feed, heartbeat=None):
+    """
+    Yields SSE messages for one client: the backlog after `last_event_id`,
+    then live events, with keep-alive comments while idle.
+    """
+    heartbeat = heartbeat or getattr(settings, "ORDER_EVENTS_HEARTBEAT_SECONDS", 15)
+    # Subscribe before reading the backlog so nothing falls in between;
+    # duplicates are skipped by id. The backlog is read page by page until
+    # it is drained, so a client far behind misses nothing.
+    queue = change_feed.subscribe(customer.pk)
+    try:
+        sent = set()
+        after_id = last_event_id
+        while after_id is not None:
+            page = await sync_to_async(change_feed.backlog)(customer, after_id)
+            for event in page:
+                sent.add(event["id"])
+                yield format_event(event)
+            after_id = page[-1]["id"] if page else None
+        yield ": connected\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if event is None:
+                return
+            if event["id"] in sent:
+                continue
+            yield format_event(event)
+    finally:
+        change_feed.unsubscribe(customer.pk, queue)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets clients negotiate text/event-stream; error bodies are sent as JSON.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode()
+
+
+class OrderEventsView(APIView):
+    """
+    Streams the authenticated customer's order transactions as SSE.
+    Resumes after the `Last-Event-ID` header (or `last_event_id` parameter).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    def get(self, request):
+        customer = Customer.objects.filter(user=request.user).first()
+        if customer is None:
+            return StreamingHttpResponse(status=404)
+        raw_cursor = request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id")
+        last_event_id = int(raw_cursor) if raw_cursor and raw_cursor.isdigit() else None
+
+        response = StreamingHttpResponse(
+            event_stream(customer, last_event_id),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
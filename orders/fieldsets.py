@@ -0,0 +1,82 @@
+"""
+Sparse fieldsets for the API viewsets.
+
+Clients pass `?fields=a,b` to receive only those fields, or `?omit=c` to drop
+fields. The selection prunes the serializer output and the SQL alike: only
+the columns backing the selected fields are loaded, and related rows are
+prefetched only when a field that needs them is selected.
+"""
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+class SparseFieldsetMixin:
+    """
+    ViewSet mixin implementing the `fields` / `omit` query parameters on
+    read requests.
+
+    Views set `field_columns`, mapping each serializer field (in output
+    order) to the model columns it needs, and optionally `field_prefetches`,
+    mapping fields to the `prefetch_related` lookups they need.
+    """
+    fields_param = "fields"
+    omit_param = "omit"
+    field_columns = None
+    field_prefetches = {}
+
+    def get_field_columns(self):
+        return self.field_columns
+
+    def get_sparse_fields(self):
+        """
+        Returns the selected field names in output order, or None when the
+        request does not ask for a sparse fieldset.
+        """
+        if not hasattr(self, "_sparse_fields"):
+            self._sparse_fields = self.parse_sparse_fields()
+        return self._sparse_fields
+
+    def parse_sparse_fields(self):
+        params = self.request.query_params
+        if self.request.method not in SAFE_METHODS or not (
+            self.fields_param in params or self.omit_param in params
+        ):
+            return None
+
+        available = list(self.get_field_columns())
+
+        def names(param):
+            values = [name.strip() for name in params.get(param, "").split(",") if name.strip()]
+            unknown = sorted(set(values) - set(available))
+            if unknown:
+                raise ValidationError({param: f"Unknown field(s): {', '.join(unknown)}."})
+            return values
+
+        selected = set(names(self.fields_param) or available)
+        omitted = set(names(self.omit_param))
+        return [name for name in available if name in selected and name not in omitted]
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_sparse_fields()
+        field_columns = self.get_field_columns()
+        if fields is None:
+            fields = list(field_columns)
+        else:
+            columns = {column for name in fields for column in field_columns[name]}
+            queryset = queryset.only("pk", *sorted(columns))
+
+        lookups = [
+            lookup
+            for name in fields
+            for lookup in self.field_prefetches.get(name, ())
+        ]
+        if lookups:
+            queryset = queryset.prefetch_related(*lookups)
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["sparse_fields"] = self.get_sparse_fields()
+        return context
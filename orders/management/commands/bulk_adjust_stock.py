@@ -0,0 +1,44 @@
+"""
+Applies a restock manifest file (see orders.restock) to the inventory.
+
+The same manifests are accepted by POST /api/inventory/bulk-adjust/; use
+the command for manifests too large for a single request. Results are
+written as one JSON object per manifest line.
+"""
+
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.restock import ManifestError, apply_manifest, read_manifest
+
+
+class Command(BaseCommand):
+    help = "Apply a CSV or NDJSON stock manifest in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Manifest file, or - for stdin.")
+        parser.add_argument("--format", choices=["csv", "ndjson"], help="Default: from the file extension.")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--errors-only", action="store_true", help="Only report lines that failed.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        manifest_format = options["format"] or ("csv" if path.endswith(".csv") else "ndjson")
+        manifest = sys.stdin if path == "-" else open(path, encoding="utf-8-sig", newline="")
+        applied = failed = 0
+        try:
+            for result in apply_manifest(read_manifest(manifest, manifest_format), options["batch_size"]):
+                if result["status"] == "ok":
+                    applied += 1
+                else:
+                    failed += 1
+                if result["status"] == "error" or not options["errors_only"]:
+                    self.stdout.write(json.dumps(result))
+        except ManifestError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if manifest is not sys.stdin:
+                manifest.close()
+        self.stderr.write(f"Applied {applied} line(s), {failed} failed.")
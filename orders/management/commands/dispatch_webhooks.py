@@ -0,0 +1,40 @@
+"""
+Delivers queued webhook events to partner endpoints.
+
+Run it periodically (or with --loop as a long-running consumer). Several
+dispatchers may run at once: each claims the deliveries it sends (see
+orders.webhooks).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.webhooks import build_session, dispatch_webhooks, webhook_settings
+
+
+class Command(BaseCommand):
+    help = "Send due webhook deliveries, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument("--workers", type=int, help="Concurrent requests (default WEBHOOKS['WORKERS']).")
+        parser.add_argument(
+            "--loop",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running, polling for due deliveries every SECONDS.",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"] or webhook_settings()["WORKERS"]
+        session = build_session(workers)
+        while True:
+            counts = dispatch_webhooks(options["batch_size"], workers=workers, session=session)
+            if any(counts.values()):
+                self.stdout.write(
+                    f"Delivered {counts['delivered']} webhook(s), {counts['failed']} failed attempt(s)."
+                )
+            if not options["loop"]:
+                return
+            time.sleep(options["loop"])
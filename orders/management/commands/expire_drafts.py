@@ -0,0 +1,22 @@
+"""
+Cancels abandoned DRAFT orders.
+
+Also scheduled hourly as the `orders.tasks.expire_draft_orders` Celery task;
+run it by hand to clear a backlog or with a different TTL.
+"""
+
+from django.core.management.base import BaseCommand
+
+from orders.expiry import expire_drafts
+
+
+class Command(BaseCommand):
+    help = "Cancel DRAFT orders older than DRAFT_ORDER_TTL_HOURS, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ttl-hours", type=float, help="Draft lifetime (default DRAFT_ORDER_TTL_HOURS).")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        expired = expire_drafts(ttl_hours=options["ttl_hours"], batch_size=options["batch_size"])
+        self.stdout.write(f"Cancelled {expired} expired draft order(s).")
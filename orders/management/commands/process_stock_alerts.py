@@ -0,0 +1,34 @@
+"""
+Dispatches queued low-stock alerts to staff.
+
+Run it periodically (or with --loop as a long-running consumer); each batch
+of pending alerts becomes one notification per configured channel.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.alerts import dispatch_pending_alerts
+
+
+class Command(BaseCommand):
+    help = "Send pending low-stock alerts through the configured channels."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running, polling for new alerts every SECONDS.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            dispatched = dispatch_pending_alerts(batch_size=options["batch_size"])
+            if dispatched:
+                self.stdout.write(f"Dispatched {dispatched} stock alert(s).")
+            if not options["loop"]:
+                return
+            time.sleep(options["loop"])
@@ -0,0 +1,65 @@
+"""
+Reports the slowest imports of a cold `django.setup()`.
+
+Runs a fresh interpreter with `python -X importtime` and the current
+settings, so the numbers reflect what every worker boot, management command
+and test run pays before handling any work.
+"""
+
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SETUP_SCRIPT = "import django; django.setup()"
+
+
+def parse_importtime(output):
+    """
+    Returns [(module, self_us, cumulative_us, top_level)] from
+    `-X importtime` output.
+    """
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        name = module.lstrip(" ")
+        # Nested imports are indented; top-level ones follow a single space.
+        rows.append((name.strip(), int(self_us), int(cumulative_us), len(module) - len(name) == 1))
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Profile the imports of django.setup() and list the slowest ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Number of imports to list.")
+        parser.add_argument(
+            "--sort",
+            choices=["cumulative", "self"],
+            default="cumulative",
+            help="Rank by time including sub-imports (default) or by own time.",
+        )
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": os.environ.get(
+            "DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE
+        )}
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", SETUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"django.setup() failed:\n{result.stderr[-2000:]}")
+
+        rows = parse_importtime(result.stderr)
+        total = sum(cumulative for _, _, cumulative, top_level in rows if top_level)
+        rows.sort(key=lambda row: row[2] if options["sort"] == "cumulative" else row[1], reverse=True)
+
+        self.stdout.write(f"{len(rows)} modules imported in {total / 1000:.1f} ms")
+        self.stdout.write(f"{'self ms':>9} {'cumulative ms':>14}  module")
+        for module, self_us, cumulative_us, _ in rows[:options["top"]]:
+            self.stdout.write(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}  {module}")
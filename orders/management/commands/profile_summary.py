@@ -0,0 +1,42 @@
+"""
+Summarises the request profiles captured by RequestProfilingMiddleware.
+
+Lists the slowest endpoints, the functions where time went (optionally only
+this project's code: views, serializers, signal handlers, ...) and the SQL
+statements with the most total time.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.profiling import load_profiles, profile_directory, summarize
+
+
+class Command(BaseCommand):
+    help = "Aggregate captured request profiles into hotspots."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", help="Profile directory (default PROFILING['DIRECTORY']).")
+        parser.add_argument("--path", default="", help="Only requests whose path starts with this.")
+        parser.add_argument("--top", type=int, default=20)
+        parser.add_argument("--sort", choices=["cumulative", "tottime"], default="cumulative")
+        parser.add_argument("--project", action="store_true", help="Only rank functions of this project.")
+
+    def handle(self, *args, **options):
+        directory = options["dir"] or profile_directory()
+        profiles = load_profiles(directory, options["path"])
+        if not profiles:
+            raise CommandError(f"No profiles found in {directory}.")
+        summary = summarize(profiles, options["top"], options["sort"], options["project"])
+
+        self.stdout.write(f"{len(profiles)} profiled request(s)\n")
+        self.stdout.write(f"{'requests':>8} {'mean ms':>9} {'max ms':>9}  endpoint")
+        for name, count, mean, peak in summary["endpoints"]:
+            self.stdout.write(f"{count:>8} {mean:>9.1f} {peak:>9.1f}  {name}")
+
+        self.stdout.write(f"\n{'calls':>8} {'tottime s':>10} {'cumtime s':>10}  function")
+        for function, calls, tottime, cumtime in summary["functions"]:
+            self.stdout.write(f"{calls:>8} {tottime:>10.4f} {cumtime:>10.4f}  {function}")
+
+        self.stdout.write(f"\n{'count':>8} {'total ms':>10}  query")
+        for sql, count, total in summary["queries"]:
+            self.stdout.write(f"{count:>8} {total:>10.1f}  {sql[:160]}")
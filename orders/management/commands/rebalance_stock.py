@@ -0,0 +1,40 @@
+"""
+Rebalances the counter shards of hot inventory items.
+
+Run periodically to even out the shards and refresh `Inventory.on_hand`
+with the shard total. With `--item` and `--shards`, changes how many
+counter shards an item uses (0 turns sharding off for the item).
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.models import Inventory
+from orders.stock import rebalance_stock
+
+
+class Command(BaseCommand):
+    help = "Rebalance sharded stock counters, or change an item's shard count."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--item", type=int, help="Inventory id to (re)configure.")
+        parser.add_argument("--shards", type=int, help="Number of counter shards for --item.")
+
+    def handle(self, *args, **options):
+        if (options["item"] is None) != (options["shards"] is None):
+            raise CommandError("--item and --shards must be given together.")
+
+        if options["item"] is not None:
+            try:
+                inventory = Inventory.objects.get(pk=options["item"])
+            except Inventory.DoesNotExist:
+                raise CommandError(f"Inventory {options['item']} does not exist.")
+            inventory.counter_shards = options["shards"]
+            items = [inventory]
+        else:
+            items = Inventory.objects.filter(counter_shards__gt=0)
+
+        for inventory in items:
+            total = rebalance_stock(inventory)
+            self.stdout.write(
+                f"{inventory.name}: {total} on hand over {inventory.counter_shards} shard(s)"
+            )
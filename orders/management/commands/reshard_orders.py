@@ -0,0 +1,143 @@
+"""
+Moves each customer's orders, items and transactions to the shard the
+customer is assigned to under the current ORDER_SHARDS.
+
+Run it after changing the number of shards, or after enabling sharding to
+move existing orders off the default database. Ids are unique across
+databases (see orders.sharding), so rows keep their primary keys. Rows
+written by older versions that allocated ids per shard may collide with
+another customer's rows on the target; such customers are re-keyed (given
+new ids from the target's range) rather than skipped. The command is safe to
+re-run after an interruption: rows already copied with their own ids are
+not copied twice. (A re-keyed customer interrupted between the copy and the
+delete from the source is copied again; check the log for such customers.)
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from orders.models import Order, OrderItem, Transaction
+from orders.sharding import get_shards, reserve_id_range, shard_for_customer
+
+
+class Command(BaseCommand):
+    help = "Move order data to the shard assigned to each customer."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            action="append",
+            help="Database alias to drain (repeatable). Defaults to the default database and every shard.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report which customers would move.",
+        )
+
+    def handle(self, *args, **options):
+        shards = get_shards()
+        if not shards:
+            raise CommandError("Sharding is not enabled (set ORDER_SHARD_COUNT).")
+
+        moved = rekeyed = 0
+        for source in options["source"] or [DEFAULT_DB_ALIAS, *shards]:
+            customer_ids = list(
+                Order.objects.using(source)
+                .order_by()
+                .values_list("customer_id", flat=True)
+                .distinct()
+            )
+            for customer_id in customer_ids:
+                target = shard_for_customer(customer_id)
+                if target == source:
+                    continue
+                if options["dry_run"]:
+                    self.stdout.write(f"Would move customer {customer_id}: {source} -> {target}")
+                    continue
+                moved += 1
+                rekeyed += self.move_customer(customer_id, source, target)
+
+        self.stdout.write(f"Moved {moved} customer(s), {rekeyed} of them re-keyed.")
+
+    def move_customer(self, customer_id, source, target):
+        """
+        Copies one customer's order data from `source` to `target`, then
+        deletes it from `source`. Returns True if the rows had to be given
+        new primary keys.
+        """
+        orders = list(Order.objects.using(source).filter(customer_id=customer_id))
+        items = list(OrderItem.objects.using(source).filter(order__customer_id=customer_id))
+        transactions = list(Transaction.objects.using(source).filter(order__customer_id=customer_id))
+
+        conflicts = (
+            Order.objects.using(target)
+            .filter(pk__in=[order.pk for order in orders])
+            .exclude(customer_id=customer_id)
+            .exists()
+            or OrderItem.objects.using(target)
+            .filter(pk__in=[item.pk for item in items])
+            .exclude(order__customer_id=customer_id)
+            .exists()
+            or Transaction.objects.using(target)
+            .filter(pk__in=[txn.pk for txn in transactions])
+            .exclude(order__customer_id=customer_id)
+            .exists()
+        )
+
+        with transaction.atomic(using=target):
+            if conflicts:
+                self.copy_rekeyed(orders, items, transactions, target)
+            else:
+                Order.objects.using(target).bulk_create(orders, ignore_conflicts=True)
+                OrderItem.objects.using(target).bulk_create(items, ignore_conflicts=True)
+                self.copy_transactions(transactions, target, ignore_conflicts=True)
+            # Copied ids from other ranges must not move the target's sequences.
+            reserve_id_range(target)
+
+        with transaction.atomic(using=source):
+            Order.objects.using(source).filter(customer_id=customer_id).delete()
+
+        self.stdout.write(
+            f"Moved customer {customer_id} ({len(orders)} orders): {source} -> {target}"
+            + (" with new ids" if conflicts else "")
+        )
+        return conflicts
+
+    @classmethod
+    def copy_rekeyed(cls, orders, items, transactions, target):
+        """
+        Inserts the rows on `target` with ids from the target's range,
+        pointing items and transactions at their orders' new ids. Rows an
+        interrupted run already copied are removed first.
+        """
+        copied = (
+            Order.objects.using(target)
+            .filter(pk__in=[order.pk for order in orders], customer_id=orders[0].customer_id)
+        )
+        copied.delete()
+        reserve_id_range(target)
+
+        old_ids = [order.pk for order in orders]
+        for order in orders:
+            order.pk = None
+        Order.objects.using(target).bulk_create(orders)
+        new_ids = dict(zip(old_ids, (order.pk for order in orders)))
+        for row in (*items, *transactions):
+            row.pk = None
+            row.order_id = new_ids[row.order_id]
+        OrderItem.objects.using(target).bulk_create(items)
+        cls.copy_transactions(transactions, target)
+
+    @staticmethod
+    def copy_transactions(transactions, target, ignore_conflicts=False):
+        """
+        Inserts transactions on `target` with their original timestamps,
+        which `bulk_create` would otherwise reset (the field is
+        auto_now_add). Run inside the copy's transaction.
+        """
+        timestamps = [txn.timestamp for txn in transactions]
+        Transaction.objects.using(target).bulk_create(transactions, ignore_conflicts=ignore_conflicts)
+        for txn, timestamp in zip(transactions, timestamps):
+            txn.timestamp = timestamp
+        Transaction.objects.using(target).bulk_update(transactions, ["timestamp"])
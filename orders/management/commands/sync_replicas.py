@@ -0,0 +1,40 @@
+"""
+Copies the primary SQLite database onto every configured read replica.
+
+Intended for local development and tests of the replica routing: run it
+after migrating or seeding the primary, or periodically to simulate
+replication lag.
+"""
+
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database onto the read replicas."
+
+    def handle(self, *args, **options):
+        replicas = getattr(settings, "DATABASE_REPLICAS", [])
+        if not replicas:
+            raise CommandError("No replicas configured (set SQLITE_REPLICA_PATHS).")
+
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if primary["ENGINE"] != "django.db.backends.sqlite3":
+            raise CommandError("sync_replicas only supports SQLite databases.")
+
+        source = sqlite3.connect(primary["NAME"])
+        try:
+            for alias in replicas:
+                target = sqlite3.connect(settings.DATABASES[alias]["NAME"])
+                try:
+                    # The backup API copies a consistent snapshot even while
+                    # the primary is being written to.
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f"Synced {alias} from {primary['NAME']}")
+        finally:
+            source.close()
@@ -0,0 +1,245 @@
+"""
+Request middleware for the orders API.
+
+`LoadSheddingMiddleware` rejects low-priority requests with
+`503 Service Unavailable` when the process is overloaded, so that
+high-priority work such as order creation keeps its latency while the
+API is being hammered.
+
+`ReplicaPinningMiddleware` tracks each request for the read-replica
+router, so users who just wrote keep reading from the primary.
+
+`RequestProfilingMiddleware` profiles sampled or explicitly requested
+requests (see orders.profiling).
+"""
+
+import cProfile
+import contextlib
+import hmac
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+
+from . import db_routers
+from .profiling import profiling_settings, save_profile
+
+DEFAULT_LOAD_SHEDDING = {
+    "ENABLED": True,
+    # Concurrent requests in this process above which low-priority
+    # requests are shed.
+    "MAX_IN_FLIGHT": 32,
+    # Smoothed database query latency (ms) above which low-priority
+    # requests are shed.
+    "DB_LATENCY_MS": 250,
+    # Half-life (seconds) used to decay the latency estimate when no
+    # queries are being measured, so shedding stops once load drops.
+    "LATENCY_HALF_LIFE": 5,
+    "RETRY_AFTER": 5,
+    # (method, path prefix) pairs that are never shed.
+    "HIGH_PRIORITY": [
+        ("POST", "/api/orders/"),
+        ("POST", "/api/token/"),
+    ],
+}
+
+
+def get_load_shedding_settings():
+    """
+    Returns the LOAD_SHEDDING settings merged over the defaults.
+    """
+    return {**DEFAULT_LOAD_SHEDDING, **getattr(settings, "LOAD_SHEDDING", {})}
+
+
+class LoadMonitor:
+    """
+    Per-process view of the current load.
+
+    Tracks the number of in-flight requests and an exponentially weighted
+    moving average of database query latency. All updates are guarded by a
+    lock, so the monitor is safe to share between request threads.
+    """
+    alpha = 0.2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self._latency_ms = 0.0
+        self._sampled_at = 0.0
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_query(self, duration_ms):
+        with self._lock:
+            self._latency_ms += self.alpha * (duration_ms - self._latency_ms)
+            self._sampled_at = time.monotonic()
+
+    def db_latency_ms(self, half_life):
+        """
+        Returns the latency estimate, decayed by the time since the last
+        measured query.
+        """
+        idle = time.monotonic() - self._sampled_at
+        return self._latency_ms * 0.5 ** (idle / half_life)
+
+    def reset(self):
+        with self._lock:
+            self.in_flight = 0
+            self._latency_ms = 0.0
+            self._sampled_at = 0.0
+
+
+monitor = LoadMonitor()
+
+
+class LoadSheddingMiddleware:
+    """
+    Sheds low-priority requests with a 503 and a Retry-After header when the
+    number of in-flight requests or the database latency crosses the
+    configured thresholds. Requests matching HIGH_PRIORITY are always served.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = get_load_shedding_settings()
+        if not config["ENABLED"]:
+            return self.get_response(request)
+
+        if not self.is_high_priority(request, config) and self.is_overloaded(config):
+            response = JsonResponse(
+                {"detail": "Service temporarily overloaded, please retry."},
+                status=503,
+            )
+            response["Retry-After"] = str(config["RETRY_AFTER"])
+            return response
+
+        monitor.enter()
+        try:
+            # Replica and shard queries count towards the latency estimate too.
+            with contextlib.ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(self.time_query))
+                return self.get_response(request)
+        finally:
+            monitor.leave()
+
+    @staticmethod
+    def is_high_priority(request, config):
+        return any(
+            request.method == method and request.path.startswith(prefix)
+            for method, prefix in config["HIGH_PRIORITY"]
+        )
+
+    @staticmethod
+    def is_overloaded(config):
+        return (
+            monitor.in_flight >= config["MAX_IN_FLIGHT"]
+            or monitor.db_latency_ms(config["LATENCY_HALF_LIFE"]) >= config["DB_LATENCY_MS"]
+        )
+
+    @staticmethod
+    def time_query(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            monitor.record_query((time.perf_counter() - start) * 1000)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Gives the database router access to the current request, and pins the
+    request's user to the primary database after a write.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = db_routers.begin_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            db_routers.end_request(token)
+
+
+class RequestProfilingMiddleware:
+    """
+    Profiles a PROFILING["SAMPLE_RATE"] fraction of requests, and requests
+    sending PROFILING["HEADER"] with the PROFILING["TOKEN"] value, capturing
+    the cProfile call statistics and every SQL query executed.
+
+    At most one request per process is profiled at a time (cProfile cannot
+    nest); others run unprofiled. Requests that are not profiled only pay
+    for a random draw and a header lookup, and profiles are written to disk
+    off the request path.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.lock = threading.Lock()
+
+    def __call__(self, request):
+        config = profiling_settings()
+        if not self.should_profile(request, config) or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request, config)
+        finally:
+            self.lock.release()
+
+    @staticmethod
+    def should_profile(request, config):
+        token = request.headers.get(config["HEADER"])
+        if token is not None:
+            return bool(config["TOKEN"]) and hmac.compare_digest(token.encode(), config["TOKEN"].encode())
+        return config["SAMPLE_RATE"] > 0 and random.random() < config["SAMPLE_RATE"]
+
+    def profile(self, request, config):
+        queries = []
+
+        def capture(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                queries.append({
+                    "db": context["connection"].alias,
+                    "sql": sql,
+                    "ms": (time.perf_counter() - start) * 1000,
+                })
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(capture))
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        name = save_profile(profiler, {
+            "method": request.method,
+            "path": request.path,
+            "route": match.view_name if match else request.path,
+            "status": response.status_code,
+            "duration_ms": duration_ms,
+            "queries": queries,
+        }, config)
+        response["X-Profile-Id"] = name
+        return response
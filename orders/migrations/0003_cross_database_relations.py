@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AlterFieldOnShards(migrations.AlterField):
+    """
+    Drops the foreign key constraints of relations that cross databases on
+    order shards only; other databases (including a default database
+    without sharding) keep them.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.alias in getattr(settings, "ORDER_SHARDS", []):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.alias in getattr(settings, "ORDER_SHARDS", []):
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0002_filter_indexes'),
+    ]
+
+    operations = [
+        AlterFieldOnShards(
+            model_name='order',
+            name='customer',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='orders.customer'),
+        ),
+        AlterFieldOnShards(
+            model_name='orderitem',
+            name='inventory',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='orders.inventory'),
+        ),
+        AlterFieldOnShards(
+            model_name='transaction',
+            name='customer',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='orders.customer'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_cross_database_relations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='InventoryStockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveSmallIntegerField()),
+                ('on_hand', models.IntegerField(default=0)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_shards', to='orders.inventory')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('inventory', 'index'), name='unique_stock_shard')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_inventory_stock_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('LOW_STOCK', 'Low stock'), ('OUT_OF_STOCK', 'Out of stock')], max_length=20)),
+                ('on_hand', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='orders.inventory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='stock_alert_pending_idx')],
+            },
+        ),
+    ]
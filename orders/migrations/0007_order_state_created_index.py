@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_webhooks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['state', 'created_at'], name='order_state_created_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_state_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockalert',
+            name='sent_channels',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
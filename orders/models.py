@@ -1,12 +1,27 @@
 """
 Defines the application models.
 """
+from django.core.cache import cache
 from django.db import models
 from django.utils.timezone import now
 from . import constants
 from django.conf import settings
 
 
+def stock_status(on_hand, warn_limit):
+    """
+    Returns the stock status for the given stock level:
+    - OUT_OF_STOCK if no items are left.
+    - FEW_REMAINING if stock is at or below the warning limit.
+    - AVAILABLE otherwise.
+    """
+    if on_hand == 0:
+        return constants.INVENTORY_STATUS["OUT_OF_STOCK"]
+    elif on_hand <= warn_limit:
+        return constants.INVENTORY_STATUS["FEW_REMAINING"]
+    return constants.INVENTORY_STATUS["AVAILABLE"]
+
+
 class Customer(models.Model):
     """
     Customer model representing customers in the system.
@@ -55,8 +70,13 @@ class Inventory(models.Model):
         on_hand (IntegerField): Quantity of the item currently in stock.
         warn_limit (IntegerField): Threshold to warn when stock is low.
         created_at (DateTimeField): Timestamp of creation.
+        counter_shards (PositiveSmallIntegerField): Number of stock counter
+            shards for hot items (0 keeps stock in `on_hand` only). When
+            sharded, stock lives in InventoryStockShard rows and `on_hand`
+            holds the total as of the last rebalance.
 
     Methods:
+        stock_level(): Returns the current quantity in stock.
         get_status(): Returns the availability status based on stock level.
         __str__(): Returns a human-readable representation of the inventory.
     """
@@ -64,6 +84,16 @@ class Inventory(models.Model):
     on_hand = models.IntegerField(default=0)
     warn_limit = models.IntegerField(default=5)
     created_at = models.DateTimeField(default=now)
+    counter_shards = models.PositiveSmallIntegerField(default=0)
+
+    def stock_level(self):
+        """
+        Returns the quantity in stock: `on_hand`, or the (cached) sum of the
+        counter shards for sharded items.
+        """
+        if not self.counter_shards:
+            return self.on_hand
+        return InventoryStockShard.objects.total(self.pk)
 
     def get_status(self):
         """
@@ -72,16 +102,110 @@ class Inventory(models.Model):
         - FEW_REMAINING if stock is at or below the warning limit.
         - AVAILABLE otherwise.
         """
-        if self.on_hand == 0:
-            return constants.INVENTORY_STATUS["OUT_OF_STOCK"]
-        elif self.on_hand <= self.warn_limit:
-            return constants.INVENTORY_STATUS["FEW_REMAINING"]
-        return constants.INVENTORY_STATUS["AVAILABLE"]
+        return stock_status(self.stock_level(), self.warn_limit)
 
     def __str__(self):
         return f"{self.name} (On Hand: {self.on_hand})"
 
 
+class StockShardManager(models.Manager):
+    """
+    Manager for InventoryStockShard with a cached per-item stock total.
+    """
+    cache_key = "stock_total:%s"
+
+    def total(self, inventory_id):
+        """
+        Returns the summed stock of an item's shards, cached for
+        STOCK_TOTAL_CACHE_SECONDS.
+        """
+        return self.totals([inventory_id])[inventory_id]
+
+    def totals(self, inventory_ids):
+        """
+        Returns {inventory id: summed stock of its shards} for several items,
+        with one cache read and, for the items not cached, one grouped query.
+        """
+        keys = {self.cache_key % inventory_id: inventory_id for inventory_id in inventory_ids}
+        if not keys:
+            return {}
+        found = cache.get_many(keys)
+        totals = {keys[key]: total for key, total in found.items()}
+        missing = [inventory_id for key, inventory_id in keys.items() if key not in found]
+        if missing:
+            summed = dict(
+                self.filter(inventory_id__in=missing)
+                .order_by()
+                .values("inventory_id")
+                .annotate(total=models.Sum("on_hand"))
+                .values_list("inventory_id", "total")
+            )
+            fresh = {inventory_id: summed.get(inventory_id) or 0 for inventory_id in missing}
+            cache.set_many(
+                {self.cache_key % inventory_id: total for inventory_id, total in fresh.items()},
+                getattr(settings, "STOCK_TOTAL_CACHE_SECONDS", 5),
+            )
+            totals.update(fresh)
+        return totals
+
+
+class InventoryStockShard(models.Model):
+    """
+    One of several sub-counters holding the stock of a hot inventory item,
+    so concurrent fulfillments update different rows.
+
+    Attributes:
+        inventory (ForeignKey): The sharded inventory item.
+        index (PositiveSmallIntegerField): Shard number, 0 to counter_shards - 1.
+        on_hand (IntegerField): Stock held by this shard.
+    """
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name="stock_shards")
+    index = models.PositiveSmallIntegerField()
+    on_hand = models.IntegerField(default=0)
+
+    objects = StockShardManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["inventory", "index"], name="unique_stock_shard"),
+        ]
+
+    def __str__(self):
+        return f"{self.inventory_id}#{self.index} (On Hand: {self.on_hand})"
+
+
+class StockAlert(models.Model):
+    """
+    Queued alert raised when an item's stock drops to or below its warning
+    limit, or runs out. Consumed in batches by `process_stock_alerts`.
+
+    Attributes:
+        inventory (ForeignKey): The item the alert is about.
+        level (CharField): LOW_STOCK or OUT_OF_STOCK.
+        on_hand (IntegerField): Stock level right after the crossing.
+        created_at (DateTimeField): When the crossing happened.
+        sent_channels (JSONField): Channels the alert was already sent through.
+        processed_at (DateTimeField): When the alert was dispatched (null if pending).
+    """
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, related_name="stock_alerts")
+    level = models.CharField(
+        max_length=20,
+        choices=[(key, value) for key, value in constants.STOCK_ALERT_LEVELS.items()]
+    )
+    on_hand = models.IntegerField()
+    created_at = models.DateTimeField(default=now)
+    sent_channels = models.JSONField(default=list, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["processed_at", "id"], name="stock_alert_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_level_display()}: {self.inventory_id} ({self.on_hand} on hand)"
+
+
 class Order(models.Model):
     """
     Order model representing customer orders.
@@ -94,7 +218,10 @@ class Order(models.Model):
     Methods:
         __str__(): Returns a human-readable representation of the order.
     """
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="orders")
+    # Orders may live on a different database than customers (orders.sharding).
+    customer = models.ForeignKey(
+        Customer, on_delete=models.CASCADE, related_name="orders", db_constraint=False
+    )
     state = models.CharField(
         max_length=20,
         choices=[(key, value) for key, value in constants.ORDER_STATES.items()],
@@ -102,6 +229,14 @@ class Order(models.Model):
     )
     created_at = models.DateTimeField(default=now)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer", "state", "created_at"], name="order_customer_state_idx"),
+            models.Index(fields=["customer", "created_at"], name="order_customer_created_idx"),
+            # Finds stale drafts for orders.expiry.
+            models.Index(fields=["state", "created_at"], name="order_state_created_idx"),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - {self.customer.name} ({self.state})"
 
@@ -120,12 +255,12 @@ class OrderItem(models.Model):
         __str__(): Returns a human-readable representation of the order item.
     """
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
-    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE)
+    inventory = models.ForeignKey(Inventory, on_delete=models.CASCADE, db_constraint=False)
     quantity = models.IntegerField()
     price_at_order = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
     def __str__(self):
-        return f"Item {self.id} (Order {self.order.id})"
+        return f"Item {self.id} (Order {self.order_id})"
 
 
 class Transaction(models.Model):
@@ -143,7 +278,9 @@ class Transaction(models.Model):
         __str__(): Returns a human-readable representation of the transaction.
     """
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="transactions")
-    customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, blank=True)
+    customer = models.ForeignKey(
+        Customer, on_delete=models.SET_NULL, null=True, blank=True, db_constraint=False
+    )
     action = models.CharField(
         max_length=50,
         choices=[(key, val) for key, val in constants.TRANSACTION_ACTIONS.items()]
@@ -151,5 +288,79 @@ class Transaction(models.Model):
     description = models.TextField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["action", "timestamp"], name="transaction_action_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} on Order #{self.order_id} by {self.customer}"
+
+
+class WebhookEndpoint(models.Model):
+    """
+    Partner URL subscribed to order events. Deliveries are signed with
+    `secret` (see orders.webhooks) and suspended by a circuit breaker while
+    the endpoint keeps failing.
+
+    Attributes:
+        url (URLField): Where events are POSTed.
+        secret (CharField): Shared HMAC-SHA256 signing secret.
+        events (JSONField): Transaction actions to deliver; empty for all.
+        is_active (BooleanField): Whether new events are queued for it.
+        failure_count (PositiveIntegerField): Consecutive failed deliveries.
+        opened_at (DateTimeField): When its circuit breaker opened (null if closed).
+        last_success_at (DateTimeField): Last successful delivery.
+        last_error (TextField): Error of the last failed delivery.
+    """
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=128)
+    events = models.JSONField(default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    failure_count = models.PositiveIntegerField(default=0)
+    opened_at = models.DateTimeField(null=True, blank=True)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def wants(self, action):
+        return not self.events or action in self.events
+
+    def __str__(self):
+        return self.url
+
+
+class WebhookDelivery(models.Model):
+    """
+    Outbox row for one event to one endpoint, sent by `dispatch_webhooks`.
+
+    Attributes:
+        endpoint (ForeignKey): The receiving endpoint.
+        event (CharField): The event type (a transaction action).
+        payload (JSONField): The event body.
+        attempts (PositiveIntegerField): Delivery attempts so far.
+        next_attempt_at (DateTimeField): When the delivery is next due.
+        delivered_at (DateTimeField): When it succeeded (null if pending).
+        failed_at (DateTimeField): When retries were given up (null if pending).
+        last_error (TextField): Error of the last failed attempt.
+        created_at (DateTimeField): When the event was queued.
+    """
+    endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name="deliveries")
+    event = models.CharField(max_length=50)
+    payload = models.JSONField()
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["delivered_at", "failed_at", "next_attempt_at"],
+                name="webhook_delivery_due_idx",
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.get_action_display()} on Order #{self.order.id} by {self.customer}"
+        return f"{self.event} -> {self.endpoint_id} ({self.attempts} attempts)"
@@ -0,0 +1,208 @@
+"""
+Request profiling: storage and summaries of captured profiles.
+
+`RequestProfilingMiddleware` (orders.middleware) profiles a sample of
+requests (PROFILING["SAMPLE_RATE"]) and any request carrying the
+PROFILING["HEADER"] header with the PROFILING["TOKEN"] value. Each profiled
+request is written to PROFILING["DIRECTORY"] as two files sharing a name:
+
+    <name>.prof  cProfile statistics (readable with pstats / snakeviz)
+    <name>.json  request method, path, status, duration and executed SQL
+
+Profiles are written by a background thread (`save_profile`), so a
+profiled request only pays for the profiling itself. Only about the newest
+PROFILING["MAX_FILES"] profiles are kept: the writer prunes the directory
+after every tenth of MAX_FILES new profiles rather than after each one. The
+`profile_summary` command aggregates them into hotspots.
+"""
+
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULTS = {
+    "SAMPLE_RATE": 0.0,
+    "TOKEN": "",
+    "HEADER": "X-Profile-Token",
+    "DIRECTORY": "profiles",
+    "MAX_FILES": 200,
+}
+
+
+def profiling_settings():
+    return {**DEFAULTS, **getattr(settings, "PROFILING", {})}
+
+
+def profile_directory(config=None):
+    directory = Path((config or profiling_settings())["DIRECTORY"])
+    if not directory.is_absolute():
+        directory = Path(settings.BASE_DIR) / directory
+    return directory
+
+
+def profile_name(meta):
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", meta["path"]).strip("-")[:60] or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{meta['method']}-{slug}-{uuid.uuid4().hex[:8]}"
+
+
+def write_profile(profiler, meta, config=None, name=None):
+    """
+    Saves one request's profile and metadata.
+
+    Args:
+        profiler (cProfile.Profile): The stopped profiler.
+        meta (dict): Request details and captured queries.
+        name (str | None): File stem to use; generated from `meta` if None.
+
+    Returns:
+        str: The profile's name (file stem).
+    """
+    config = config or profiling_settings()
+    directory = profile_directory(config)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = name or profile_name(meta)
+    profiler.dump_stats(directory / f"{name}.prof")
+    (directory / f"{name}.json").write_text(json.dumps(meta))
+    return name
+
+
+def prune_profiles(config=None):
+    """
+    Drops the oldest profiles beyond MAX_FILES.
+    """
+    config = config or profiling_settings()
+    profiles = sorted(profile_directory(config).glob("*.json"), key=os.path.getmtime)
+    for stale in profiles[:max(0, len(profiles) - config["MAX_FILES"])]:
+        stale.unlink(missing_ok=True)
+        stale.with_suffix(".prof").unlink(missing_ok=True)
+
+
+class ProfileWriter:
+    """
+    Writes profiles on one background thread and prunes the directory once
+    every max(1, MAX_FILES // 10) writes.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._unpruned = 0
+
+    def submit(self, profiler, meta, config):
+        """
+        Queues a profile for writing and returns the name it will have.
+        """
+        name = profile_name(meta)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+            self._executor.submit(self._write, profiler, meta, config, name)
+        return name
+
+    def _write(self, profiler, meta, config, name):
+        write_profile(profiler, meta, config, name)
+        self._unpruned += 1
+        if self._unpruned >= max(1, config["MAX_FILES"] // 10):
+            self._unpruned = 0
+            prune_profiles(config)
+
+    def wait(self):
+        """
+        Blocks until the queued profiles are written.
+        """
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.submit(lambda: None).result()
+
+
+writer = ProfileWriter()
+
+
+def save_profile(profiler, meta, config=None):
+    """
+    Saves a profile in the background (see ProfileWriter).
+
+    Returns:
+        str: The profile's name (file stem).
+    """
+    return writer.submit(profiler, meta, config or profiling_settings())
+
+
+def load_profiles(directory=None, path_prefix=""):
+    """
+    Returns [(meta, prof_path)] of the stored profiles whose request path
+    starts with `path_prefix`.
+    """
+    directory = Path(directory) if directory else profile_directory()
+    profiles = []
+    for meta_path in sorted(directory.glob("*.json")):
+        prof_path = meta_path.with_suffix(".prof")
+        if not prof_path.exists():
+            continue
+        meta = json.loads(meta_path.read_text())
+        if meta["path"].startswith(path_prefix):
+            profiles.append((meta, prof_path))
+    return profiles
+
+
+def summarize(profiles, top=20, sort="cumulative", project_only=False):
+    """
+    Aggregates stored profiles.
+
+    Args:
+        profiles (list): Output of `load_profiles`.
+        top (int): Rows per section.
+        sort (str): "cumulative" or "tottime" for the function ranking.
+        project_only (bool): Only rank functions defined in this project.
+
+    Returns:
+        dict: "endpoints" [(method path, count, mean ms, max ms)],
+        "functions" [(function, calls, tottime s, cumtime s)] and
+        "queries" [(sql, count, total ms)].
+    """
+    durations = defaultdict(list)
+    queries = defaultdict(lambda: [0, 0.0])
+    for meta, _ in profiles:
+        durations[f"{meta['method']} {meta['route']}"].append(meta["duration_ms"])
+        for query in meta["queries"]:
+            entry = queries[query["sql"]]
+            entry[0] += 1
+            entry[1] += query["ms"]
+
+    endpoints = sorted(
+        ((name, len(values), sum(values) / len(values), max(values)) for name, values in durations.items()),
+        key=lambda row: row[1] * row[2],
+        reverse=True,
+    )
+
+    functions = []
+    if profiles:
+        stats = pstats.Stats(*(str(prof_path) for _, prof_path in profiles))
+        base_dir = str(settings.BASE_DIR)
+        column = 3 if sort == "cumulative" else 2
+        for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            if project_only and (not filename.startswith(base_dir) or "site-packages" in filename):
+                continue
+            location = os.path.relpath(filename, base_dir) if filename.startswith(base_dir) else filename
+            functions.append((f"{location}:{line}({function})", calls, tottime, cumtime))
+        functions.sort(key=lambda row: row[column], reverse=True)
+
+    return {
+        "endpoints": endpoints[:top],
+        "functions": functions[:top],
+        "queries": sorted(
+            ((sql, count, total) for sql, (count, total) in queries.items()),
+            key=lambda row: row[2],
+            reverse=True,
+        )[:top],
+    }
@@ -0,0 +1,107 @@
+"""
+Retry and circuit-breaker helpers for calls to external services.
+
+`CircuitBreaker` holds no state of its own: it reads and updates a state
+holder with `failure_count` and `opened_at` attributes, so the same policy
+works for state kept in memory (`BreakerState`) or persisted on a model
+(e.g. WebhookEndpoint). Holders that also keep a window of recent outcomes
+(`BreakerState(window=N)`) can trip on the failure rate as well.
+"""
+
+import random
+from collections import deque
+from datetime import timedelta
+
+from django.utils import timezone
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def backoff_delay(attempt, base, cap):
+    """
+    Returns the delay in seconds before retry number `attempt` (1-based):
+    exponential growth from `base`, capped at `cap`, with jitter so failed
+    callers do not retry in lockstep.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return random.uniform(delay / 2, delay)
+
+
+class BreakerState:
+    """
+    In-memory state holder for a CircuitBreaker, optionally remembering the
+    outcomes (True for success) of the last `window` calls.
+    """
+
+    def __init__(self, window=0):
+        self.failure_count = 0
+        self.opened_at = None
+        self.outcomes = deque(maxlen=window) if window else None
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures, or once the
+    failure rate over a holder's outcome window reaches `failure_rate`
+    (after at least `min_calls` calls). While open, calls are refused; after
+    `reset_seconds` the breaker is half-open and lets a probe through, which
+    closes it on success or re-opens it on failure.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the breaker.
+        reset_seconds (float): How long the breaker stays open.
+        failure_rate (float | None): Failure ratio that opens the breaker.
+        min_calls (int): Outcomes needed before the rate is considered.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=60, failure_rate=None, min_calls=10):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+
+    def reopens_at(self, state):
+        return state.opened_at + timedelta(seconds=self.reset_seconds)
+
+    def state(self, state, now=None):
+        """
+        Returns CLOSED, OPEN or HALF_OPEN for a state holder.
+        """
+        if state.opened_at is None:
+            return CLOSED
+        if (now or timezone.now()) < self.reopens_at(state):
+            return OPEN
+        return HALF_OPEN
+
+    def allow(self, state, now=None):
+        return self.state(state, now) != OPEN
+
+    def record_success(self, state):
+        outcomes = getattr(state, "outcomes", None)
+        if outcomes is not None:
+            if state.opened_at is not None:
+                outcomes.clear()
+            outcomes.append(True)
+        state.failure_count = 0
+        state.opened_at = None
+
+    def rate_exceeded(self, state):
+        outcomes = getattr(state, "outcomes", None)
+        if self.failure_rate is None or outcomes is None or len(outcomes) < self.min_calls:
+            return False
+        return outcomes.count(False) / len(outcomes) >= self.failure_rate
+
+    def record_failure(self, state, now=None):
+        """
+        Counts a failure. Returns True if this failure opened the breaker.
+        """
+        was_open = state.opened_at is not None
+        state.failure_count += 1
+        if getattr(state, "outcomes", None) is not None:
+            state.outcomes.append(False)
+        if was_open or state.failure_count >= self.failure_threshold or self.rate_exceeded(state):
+            state.opened_at = now or timezone.now()
+            return not was_open
+        return False
@@ -0,0 +1,196 @@
+"""
+Bulk stock adjustments from supplier manifests.
+
+A manifest is CSV (with a header row) or NDJSON (one JSON object per line).
+Each record names an item by `id` or `name` and gives either a relative
+`delta` ("+20", "-3") or an absolute `quantity`:
+
+    id,name,delta,quantity          {"name": "Widget", "delta": 20}
+    12,,+20,                        {"id": 7, "quantity": 150}
+    ,Widget,,150
+
+Manifests are read line by line, so memory use does not grow with their
+size. Records are applied in batches: one query resolves a batch's items,
+each change is an atomic database-side update through orders.stock (never
+a read-modify-write), each batch commits as one transaction, and inventory
+ETags are invalidated once per batch.
+"""
+
+import codecs
+import csv
+import json
+
+from django.db import DatabaseError, router, transaction
+from django.db.models import Q
+
+from .conditional import INVENTORY_SCOPE, bump_version
+from .models import Inventory
+from .stock import adjust_stock, set_stock
+
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+
+class ManifestError(ValueError):
+    """
+    Raised for a malformed manifest or manifest record.
+    """
+
+
+def _text_lines(lines):
+    """
+    Yields text lines from an iterable of bytes or str lines.
+    """
+    decoder = None
+    for line in lines:
+        if isinstance(line, bytes):
+            decoder = decoder or codecs.getincrementaldecoder("utf-8-sig")()
+            line = decoder.decode(line)
+        yield line
+
+
+def _parse_int(value, field):
+    if isinstance(value, bool):
+        raise ManifestError(f"{field} must be an integer.")
+    if isinstance(value, int):
+        return value
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise ManifestError(f"{field} must be an integer, got {value!r}.")
+
+
+def parse_record(raw):
+    """
+    Validates one manifest record.
+
+    Args:
+        raw (dict): The record's fields; empty strings count as missing.
+
+    Returns:
+        dict: {"key": ("id", int) | ("name", str), "mode": "delta" | "quantity", "value": int}
+    """
+    if not isinstance(raw, dict):
+        raise ManifestError("Record must be an object.")
+    fields = {key: value for key, value in raw.items() if value not in (None, "")}
+    if "id" in fields:
+        key = ("id", _parse_int(fields["id"], "id"))
+    elif "name" in fields:
+        key = ("name", str(fields["name"]).strip())
+    else:
+        raise ManifestError("Record needs an id or a name.")
+    modes = [mode for mode in ("delta", "quantity") if mode in fields]
+    if len(modes) != 1:
+        raise ManifestError("Record needs exactly one of delta or quantity.")
+    value = _parse_int(fields[modes[0]], modes[0])
+    if modes[0] == "quantity" and value < 0:
+        raise ManifestError("quantity cannot be negative.")
+    return {"key": key, "mode": modes[0], "value": value}
+
+
+def _csv_records(lines):
+    reader = csv.DictReader(lines)
+    columns = set(reader.fieldnames or ())
+    if not columns & {"id", "name"} or not columns & {"delta", "quantity"}:
+        raise ManifestError("CSV header needs an id or name column and a delta or quantity column.")
+
+    def records():
+        for row in reader:
+            try:
+                yield reader.line_num, parse_record(row)
+            except ManifestError as exc:
+                yield reader.line_num, exc
+
+    return records()
+
+
+def _ndjson_records(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, parse_record(json.loads(line))
+        except json.JSONDecodeError as exc:
+            yield number, ManifestError(f"Invalid JSON: {exc.msg}.")
+        except ManifestError as exc:
+            yield number, exc
+
+
+def read_manifest(lines, manifest_format):
+    """
+    Returns an iterator of (line number, record or ManifestError).
+
+    Args:
+        lines (iterable): The manifest's lines, as bytes or str.
+        manifest_format (str): "csv" or "ndjson".
+    """
+    lines = _text_lines(lines)
+    if manifest_format == "csv":
+        return _csv_records(lines)
+    if manifest_format == "ndjson":
+        return _ndjson_records(lines)
+    raise ManifestError(f"Unsupported manifest format {manifest_format!r}.")
+
+
+def apply_manifest(entries, batch_size=500):
+    """
+    Applies manifest records batch by batch, yielding one result per line
+    once its batch has committed:
+
+        {"line": 3, "status": "ok", "id": 12, "name": "Widget", "on_hand": 40}
+        {"line": 4, "status": "error", "error": "Unknown item name 'Gadget'."}
+    """
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield from _apply_batch(batch)
+            batch = []
+    if batch:
+        yield from _apply_batch(batch)
+
+
+def _apply_batch(batch):
+    records = [record for _, record in batch if not isinstance(record, ManifestError)]
+    ids = {record["key"][1] for record in records if record["key"][0] == "id"}
+    names = {record["key"][1] for record in records if record["key"][0] == "name"}
+    items = {}
+    if records:
+        for inventory in Inventory.objects.filter(Q(pk__in=ids) | Q(name__in=names)):
+            items[("id", inventory.pk)] = items[("name", inventory.name)] = inventory
+
+    using = router.db_for_write(Inventory)
+    results = []
+    try:
+        with transaction.atomic(using=using):
+            for line, record in batch:
+                if isinstance(record, ManifestError):
+                    results.append({"line": line, "status": "error", "error": str(record)})
+                    continue
+                inventory = items.get(record["key"])
+                if inventory is None:
+                    kind, value = record["key"]
+                    results.append({"line": line, "status": "error", "error": f"Unknown item {kind} {value!r}."})
+                    continue
+                if record["mode"] == "delta":
+                    on_hand = adjust_stock(inventory, record["value"], invalidate=False)
+                else:
+                    on_hand = set_stock(inventory, record["value"], invalidate=False)
+                if not inventory.counter_shards:
+                    # Later lines for the same item see the new level.
+                    inventory.on_hand = on_hand
+                results.append({
+                    "line": line, "status": "ok", "id": inventory.pk,
+                    "name": inventory.name, "on_hand": on_hand,
+                })
+            if any(result["status"] == "ok" for result in results):
+                bump_version(INVENTORY_SCOPE, using=using)
+    except DatabaseError as exc:
+        return [
+            {"line": line, "status": "error", "error": f"Batch rolled back: {exc}"}
+            for line, _ in batch
+        ]
+    return results
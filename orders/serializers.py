@@ -1,9 +1,24 @@
 # orders/serializers.py
+from django.db import router, transaction
 from rest_framework import serializers
 from .models import Customer, Inventory, Order, OrderItem, Transaction
+from .stock import set_stock
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """
+    Serializer mixin that drops every field not listed in the
+    `sparse_fields` serializer context entry (see orders.fieldsets).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        sparse_fields = self.context.get("sparse_fields")
+        if sparse_fields is not None:
+            for name in set(self.fields) - set(sparse_fields):
+                self.fields.pop(name)
+
+
+class CustomerSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Customer model.
 
@@ -15,7 +30,7 @@ class CustomerSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'code', 'phone_number']
 
 
-class InventorySerializer(serializers.ModelSerializer):
+class InventorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Inventory model.
 
@@ -34,6 +49,32 @@ class InventorySerializer(serializers.ModelSerializer):
         """
         return obj.get_status()
 
+    def to_representation(self, instance):
+        """
+        Reports the summed shard stock as on_hand for sharded items.
+        """
+        data = super().to_representation(instance)
+        if instance.counter_shards and "on_hand" in data:
+            data["on_hand"] = instance.stock_level()
+        return data
+
+    def update(self, instance, validated_data):
+        """
+        Applies on_hand through orders.stock, so sharded items are
+        redistributed rather than overwritten and concurrent stock
+        deductions are never lost.
+        """
+        on_hand = validated_data.pop("on_hand", None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if validated_data:
+            # Only write the changed columns, never a stale on_hand.
+            instance.save(update_fields=list(validated_data))
+        if on_hand is not None:
+            set_stock(instance, on_hand)
+            instance.refresh_from_db(fields=["on_hand"])
+        return instance
+
 
 class OrderItemSerializer(serializers.ModelSerializer):
     """
@@ -54,7 +95,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         fields = ['id', 'inventory_id', 'inventory_name', 'quantity', 'price_at_order']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Order model.
 
@@ -69,18 +110,21 @@ class OrderSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """
-        Creates an Order instance along with its related OrderItem instances.
+        Creates an Order instance along with its related OrderItem instances,
+        in a single transaction on the database the order is routed to.
         """
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
+        order = Order(**validated_data)
+        with transaction.atomic(using=router.db_for_write(Order, instance=order)):
+            order.save()
 
-        for item in items_data:
-            OrderItem.objects.create(order=order, **item)
+            for item in items_data:
+                order.items.create(**item)
 
         return order
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the Transaction model.
 
@@ -0,0 +1,187 @@
+"""
+Optional customer-keyed sharding of order data.
+
+When ORDER_SHARDS lists database aliases, every `Order`, `OrderItem` and
+`Transaction` row lives on the shard chosen from its customer's id, while
+customers, inventory and everything else stay on the default database (the
+shards only hold those three tables).
+Views route queries explicitly with `customer_db()`; saves and related
+lookups are routed by `OrderShardRouter` from the instance being written.
+
+Relations that cross databases (order -> customer, item -> inventory,
+transaction -> customer) have no database-level constraint on the shards
+(the default database keeps them), and deleting a customer does not cascade
+into the shards.
+
+Primary keys of sharded rows are unique across databases: each shard
+allocates them from its own range of ID_RANGE_SIZE ids (`id_range`), above
+the ids of rows created before sharding was enabled. Rows therefore keep
+their ids when `reshard_orders` moves them, and order, transaction and
+event ids never collide. The order of ORDER_SHARDS must not change once
+rows have been written, since it decides the ranges.
+"""
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SHARDED_MODELS = {"order", "orderitem", "transaction"}
+
+# Ids allocated per shard; the default database uses the ids below the
+# first range.
+ID_RANGE_SIZE = 2 ** 40
+
+
+def get_shards():
+    return getattr(settings, "ORDER_SHARDS", [])
+
+
+def sharding_enabled():
+    return bool(get_shards())
+
+
+def shard_for_customer(customer_id, shards=None):
+    """
+    Returns the alias holding the given customer's orders.
+
+    Args:
+        customer_id (int): The customer's primary key.
+        shards (list | None): Shard aliases to choose from; defaults to
+            ORDER_SHARDS.
+    """
+    shards = get_shards() if shards is None else shards
+    if not shards:
+        return DEFAULT_DB_ALIAS
+    return shards[customer_id % len(shards)]
+
+
+def customer_db(customer):
+    """
+    Returns the alias to query for the given customer's order data, or None
+    (leave it to the routers, e.g. to read from a replica) when sharding is
+    off.
+    """
+    if not sharding_enabled():
+        return None
+    return shard_for_customer(customer.pk)
+
+
+def order_databases():
+    """
+    Returns every alias that may hold order data, for jobs that must visit
+    all orders (e.g. maintenance commands).
+    """
+    return get_shards() or [DEFAULT_DB_ALIAS]
+
+
+def sharded_models():
+    return [apps.get_model("orders", name) for name in sorted(SHARDED_MODELS)]
+
+
+def id_range(alias):
+    """
+    Returns the (first, last) primary key a shard allocates for sharded
+    rows, or None if `alias` is not a shard.
+    """
+    shards = get_shards()
+    if alias not in shards:
+        return None
+    first = (shards.index(alias) + 1) * ID_RANGE_SIZE
+    return first, first + ID_RANGE_SIZE - 1
+
+
+def reserve_id_range(alias):
+    """
+    Points the id sequences of the sharded tables on `alias` at the next
+    unused id of the shard's range. Run after migrating a shard and after
+    copying rows with ids from other ranges onto it (which would otherwise
+    advance the sequence into another shard's range).
+    """
+    bounds = id_range(alias)
+    if bounds is None:
+        return
+    first, last = bounds
+    connection = connections[alias]
+    if connection.vendor not in ("sqlite", "postgresql"):
+        raise ImproperlyConfigured(f"Order sharding does not support {connection.vendor} databases.")
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            table = model._meta.db_table
+            cursor.execute(
+                f"SELECT MAX(id) FROM {connection.ops.quote_name(table)} WHERE id BETWEEN %s AND %s",
+                [first, last],
+            )
+            used = cursor.fetchone()[0] or first - 1
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)", [table, used])
+                continue
+            cursor.execute("UPDATE sqlite_sequence SET seq = %s WHERE name = %s", [used, table])
+            if cursor.rowcount == 0:
+                cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)", [table, used])
+
+
+def is_sharded(model):
+    return model._meta.app_label == "orders" and model._meta.model_name in SHARDED_MODELS
+
+
+def shard_for_instance(instance):
+    """
+    Returns the shard an instance's order data belongs to, or None if it
+    cannot be told from the instance.
+    """
+    model_name = instance._meta.model_name
+    if instance._meta.app_label != "orders":
+        return None
+    if model_name == "customer" and instance.pk is not None:
+        return shard_for_customer(instance.pk)
+    # Saved rows stay where they are, including orders left on the default
+    # database until reshard_orders moves them.
+    if model_name in SHARDED_MODELS and instance._state.db in (DEFAULT_DB_ALIAS, *get_shards()):
+        return instance._state.db
+    if model_name == "order":
+        if instance.customer_id is not None:
+            return shard_for_customer(instance.customer_id)
+    if model_name in ("orderitem", "transaction"):
+        order = instance._meta.get_field("order").get_cached_value(instance, None)
+        if order is not None:
+            return shard_for_instance(order)
+    return None
+
+
+class OrderShardRouter:
+    """
+    Routes sharded models to their customer's shard. Non-sharded models
+    reached from a sharded instance are sent to the default database.
+    """
+
+    def _route(self, model, hints):
+        if not sharding_enabled():
+            return None
+        instance = hints.get("instance")
+        if not is_sharded(model):
+            if instance is not None and instance._state.db in get_shards():
+                return DEFAULT_DB_ALIAS
+            return None
+        if instance is not None:
+            return shard_for_instance(instance)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not sharding_enabled():
+            return None
+        databases = {DEFAULT_DB_ALIAS, *get_shards()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_shards():
+            return app_label == "orders" and (model_name is None or model_name in SHARDED_MODELS)
+        return None
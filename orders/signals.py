@@ -2,45 +2,35 @@
 Signal handlers for Order-related events.
 This module handles automatic creation of transactions,
 order state tracking, stock updates, and SMS notifications
-via Africa's Talking API.
+through the configured SMS provider (see orders.sms).
 """
 
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.db import transaction
 from django.dispatch import receiver
 from django.conf import settings
-from .models import Order, OrderItem, Transaction, Inventory, Customer
-import africastalking
-from africastalking.SMS import SMSService
-import uuid
+from .models import Order, OrderItem, Transaction, Inventory, Customer, WebhookEndpoint
+from .conditional import INVENTORY_NAMES_SCOPE, INVENTORY_SCOPE, bump_orders_version, bump_version
+from .stock import adjust_stock
+from .webhooks import enqueue_transactions, invalidate_endpoints
+from .sms import send_sms
+from .sharding import reserve_id_range
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-# Initialize Africa's Talking SDK
-AT_USERNAME = getattr(settings, "AFRICASTALKING_USERNAME", "sandbox")
-AT_API_KEY = getattr(settings, "AFRICASTALKING_API_KEY", "")
 
-sms = SMSService(AT_USERNAME, AT_API_KEY)
-
-
-def send_sms(phone_number, message):
+def notify(phone_number, message, using=None):
     """
-    Send an SMS message using Africa's Talking SMS service.
+    Send an SMS once the current transaction commits, so the network call
+    never runs while the database write lock is held.
 
     Args:
         phone_number (str): The recipient's phone number.
         message (str): The message body.
-
-    Returns:
-        dict | None: API response if successful, None if sending fails.
+        using (str | None): Database alias whose transaction to wait for.
     """
-    try:
-        response = sms.send(message, [phone_number])
-        print("SMS Response:", response)  
-        return response
-    except Exception as e:
-        print(f"SMS sending failed: {e}")
-        return None
+    transaction.on_commit(lambda: send_sms(phone_number, message), using=using)
 
 
 @receiver(pre_save, sender=Order)
@@ -56,7 +46,7 @@ def track_order_state(sender, instance, **kwargs):
     """
     if instance.pk:  # existing order
         try:
-            old = Order.objects.get(pk=instance.pk)
+            old = Order.objects.using(kwargs.get("using")).get(pk=instance.pk)
             instance._old_state = old.state
         except Order.DoesNotExist:
             instance._old_state = None
@@ -84,19 +74,18 @@ def create_order_transactions(sender, instance, created, **kwargs):
         created (bool): True if a new Order was created, False if updated.
         kwargs: Additional keyword arguments.
     """
+    using = kwargs.get("using")
     if created:
         # New order  create CREATE_ORDER transaction
-        Transaction.objects.create(
-            order=instance,
+        instance.transactions.create(
             action="CREATE_ORDER",
             description="Order created"
         )
         # Send SMS on order placed
-        send_sms(instance.customer.phone_number, f"Your order {instance.id} has been placed.")
+        notify(instance.customer.phone_number, f"Your order {instance.id} has been placed.", using)
     else:
         # Order updated  log UPDATE_ORDER
-        Transaction.objects.create(
-            order=instance,
+        instance.transactions.create(
             action="UPDATE_ORDER",
             description="Order updated"
         )
@@ -105,8 +94,7 @@ def create_order_transactions(sender, instance, created, **kwargs):
         old_state = getattr(instance, "_old_state", None)
         if old_state and old_state != instance.state:
             # Log state change
-            Transaction.objects.create(
-                order=instance,
+            instance.transactions.create(
                 action=f"STATE_{instance.state}",
                 description=f"Order moved from {old_state} to {instance.state}"
             )
@@ -114,13 +102,98 @@ def create_order_transactions(sender, instance, created, **kwargs):
             # Handle specific transitions
             if instance.state == "FULFILLED":
                 # Deduct stock
-                for item in OrderItem.objects.filter(order=instance):
-                    inv = item.inventory
-                    inv.on_hand -= item.quantity
-                    inv.save()
+                for item in instance.items.prefetch_related("inventory"):
+                    adjust_stock(item.inventory, -item.quantity)
 
                 # Send SMS
-                send_sms(instance.customer.phone_number, f"Your order {instance.id} has been fulfilled.")
+                notify(instance.customer.phone_number, f"Your order {instance.id} has been fulfilled.", using)
 
             elif instance.state == "CANCELLED":
-                send_sms(instance.customer.phone_number, f"Your order {instance.id} has been cancelled.")
+                notify(instance.customer.phone_number, f"Your order {instance.id} has been cancelled.", using)
+
+
+@receiver(pre_save, sender=Inventory)
+def track_inventory_name(sender, instance, **kwargs):
+    """
+    Signal handler to record whether an existing Inventory item's name
+    changes with this save, so order ETags are only invalidated by renames.
+
+    Args:
+        sender (Model): The model class (`Inventory`).
+        instance (Inventory): The Inventory instance being saved.
+        kwargs: Additional keyword arguments.
+    """
+    update_fields = kwargs.get("update_fields")
+    if not instance.pk or (update_fields is not None and "name" not in update_fields):
+        instance._name_changed = False
+        return
+    old_name = (
+        Inventory.objects.using(kwargs.get("using"))
+        .filter(pk=instance.pk)
+        .values_list("name", flat=True)
+        .first()
+    )
+    instance._name_changed = old_name != instance.name
+
+
+@receiver(post_save, sender=Inventory)
+@receiver(post_delete, sender=Inventory)
+def invalidate_inventory_version(sender, instance, **kwargs):
+    """
+    Signal handler that invalidates inventory ETags whenever an
+    Inventory item is saved or deleted, and order ETags when it is
+    renamed or deleted.
+    """
+    scopes = [INVENTORY_SCOPE]
+    if kwargs["signal"] is post_delete or getattr(instance, "_name_changed", False):
+        scopes.append(INVENTORY_NAMES_SCOPE)
+    bump_version(*scopes, using=kwargs.get("using"))
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_version(sender, instance, **kwargs):
+    """
+    Signal handler that invalidates the owning customer's order ETags
+    whenever an Order is saved or deleted.
+    """
+    bump_orders_version(kwargs.get("using"), customer_id=instance.customer_id)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def invalidate_order_item_version(sender, instance, **kwargs):
+    """
+    Signal handler that invalidates the owning customer's order ETags
+    whenever an OrderItem is saved or deleted.
+    """
+    bump_orders_version(kwargs.get("using"), order_id=instance.order_id)
+
+
+@receiver(post_save, sender=Transaction)
+def queue_transaction_webhooks(sender, instance, created, **kwargs):
+    """
+    Signal handler that queues webhook deliveries for a new Transaction.
+    """
+    if created:
+        enqueue_transactions([instance], using=kwargs.get("using"))
+
+
+@receiver(post_save, sender=WebhookEndpoint)
+@receiver(post_delete, sender=WebhookEndpoint)
+def invalidate_webhook_endpoints(sender, instance, **kwargs):
+    """
+    Signal handler that refreshes the cached endpoint list whenever a
+    WebhookEndpoint is saved or deleted.
+    """
+    transaction.on_commit(invalidate_endpoints, using=kwargs.get("using"))
+
+
+@receiver(post_migrate)
+def reserve_shard_ids(sender, using, **kwargs):
+    """
+    Signal handler that points a freshly migrated order shard's id
+    sequences at the shard's id range.
+    """
+    if sender.label == "orders":
+        reserve_id_range(using)
@@ -1,24 +1,268 @@
-import africastalking
+"""
+SMS delivery behind a pluggable provider interface.
+
+SMS_PROVIDER selects the provider: "africastalking" (default), "memory"
+(keeps messages in `outbox`, for tests and local development), "null"
+(drops them), or the dotted path of an SMSProvider subclass. The provider is
+built on first use, so worker boot, management commands and test runs do
+not pay for it.
+
+Remote providers are wrapped in `ResilientProvider`: every call has connect
+and read timeouts (SMS["CONNECT_TIMEOUT"], SMS["READ_TIMEOUT"]), and a
+circuit breaker fails calls fast with SMSUnavailable once the provider keeps
+failing, probing it again after SMS["RESET_SECONDS"]. Breaker state changes
+are logged, and the breaker's metrics are published to the cache under
+`circuit:sms` for dashboards and health checks.
+
+The breaker and its counters live in each worker process: every process
+trips and probes on its own, and `circuit:sms` holds the metrics of the
+process that published last, not a total across workers.
+"""
+
+import logging
+import threading
+from collections import Counter
+
 from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .resilience import CLOSED, HALF_OPEN, OPEN, BreakerState, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+METRICS_KEY = "circuit:%s"
+
+DEFAULTS = {
+    "ENDPOINT": None,
+    "CONNECT_TIMEOUT": 3,
+    "READ_TIMEOUT": 5,
+    "FAILURE_THRESHOLD": 5,
+    "FAILURE_RATE": 0.5,
+    "WINDOW": 20,
+    "MIN_CALLS": 10,
+    "RESET_SECONDS": 30,
+}
+
+
+def sms_settings():
+    return {**DEFAULTS, **getattr(settings, "SMS", {})}
+
+
+class SMSUnavailable(Exception):
+    """
+    Raised without calling the provider while its circuit breaker is open.
+    """
+
+
+class SMSProvider:
+    """
+    Sends text messages. Subclasses implement `send`; providers that make
+    network calls set `remote` so they are wrapped in ResilientProvider.
+    """
+    remote = False
+
+    def send(self, message, recipients):
+        """
+        Sends `message` to a list of phone numbers.
+
+        Returns:
+            The provider's response.
+        """
+        raise NotImplementedError(".send() must be overridden")
+
+
+class AfricasTalkingProvider(SMSProvider):
+    """
+    Sends through the Africa's Talking messaging API over a pooled HTTP
+    session with connect and read timeouts.
+    """
+    remote = True
+    LIVE_ENDPOINT = "https://api.africastalking.com/version1/messaging"
+    SANDBOX_ENDPOINT = "https://api.sandbox.africastalking.com/version1/messaging"
+
+    def __init__(self, username=None, api_key=None, endpoint=None):
+        config = sms_settings()
+        self.username = username or getattr(settings, "AFRICASTALKING_USERNAME", "sandbox")
+        self.api_key = api_key if api_key is not None else getattr(settings, "AFRICASTALKING_API_KEY", "")
+        self.endpoint = endpoint or config["ENDPOINT"] or (
+            self.SANDBOX_ENDPOINT if self.username == "sandbox" else self.LIVE_ENDPOINT
+        )
+        self.timeout = (config["CONNECT_TIMEOUT"], config["READ_TIMEOUT"])
+        self.session = None
+
+    def send(self, message, recipients):
+        import requests
+
+        if self.session is None:
+            self.session = requests.Session()
+        response = self.session.post(
+            self.endpoint,
+            data={"username": self.username, "to": ",".join(recipients), "message": message},
+            headers={"apiKey": self.api_key, "Accept": "application/json"},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+
+class ResilientProvider(SMSProvider):
+    """
+    Wraps a provider in a circuit breaker. While the breaker is open, sends
+    raise SMSUnavailable immediately; when half-open, a single probe call
+    goes through and the others are still refused. Outcomes of calls that
+    started before the breaker last changed state are counted but do not
+    move the breaker, so a slow call from before it opened cannot close it.
+
+    Args:
+        provider (SMSProvider): The provider to protect.
+        name (str): Name used in logs and the metrics cache key.
+    """
+    remote = True
+
+    def __init__(self, provider, name="sms"):
+        config = sms_settings()
+        self.provider = provider
+        self.name = name
+        self.breaker = CircuitBreaker(
+            config["FAILURE_THRESHOLD"],
+            config["RESET_SECONDS"],
+            failure_rate=config["FAILURE_RATE"],
+            min_calls=config["MIN_CALLS"],
+        )
+        self.state = BreakerState(window=config["WINDOW"])
+        self.counters = Counter(calls=0, successes=0, failures=0, rejected=0, opened=0)
+        self.probing = False
+        # Bumped on every state change recorded by a call.
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def send(self, message, recipients):
+        call = self._acquire()
+        try:
+            response = self.provider.send(message, recipients)
+        except Exception as exc:
+            self._record(call, exc)
+            raise
+        self._record(call, None)
+        return response
+
+    def _acquire(self):
+        """
+        Admits a call, returning its (generation, is_probe) ticket.
+        """
+        with self.lock:
+            state = self.breaker.state(self.state)
+            if state == OPEN or (state == HALF_OPEN and self.probing):
+                self.counters["rejected"] += 1
+                self.publish()
+                raise SMSUnavailable(f"{self.name} circuit is open")
+            self.probing = state == HALF_OPEN
+            self.counters["calls"] += 1
+            return self.generation, self.probing
+
+    def _record(self, call, error):
+        generation, probe = call
+        with self.lock:
+            if probe:
+                self.probing = False
+            self.counters["successes" if error is None else "failures"] += 1
+            if generation != self.generation:
+                self.publish()
+                return
+            before = self.breaker.state(self.state)
+            if error is None:
+                self.breaker.record_success(self.state)
+            else:
+                self.breaker.record_failure(self.state)
+            after = self.breaker.state(self.state)
+            if after != before:
+                self.generation += 1
+                if after == OPEN:
+                    self.counters["opened"] += 1
+                    logger.warning("%s circuit opened after error: %s", self.name, error)
+                elif after == CLOSED:
+                    logger.info("%s circuit closed", self.name)
+            self.publish()
+
+    def metrics(self):
+        """
+        Returns the breaker state and call counters.
+        """
+        return {
+            "state": self.breaker.state(self.state),
+            "consecutive_failures": self.state.failure_count,
+            "opened_at": self.state.opened_at.isoformat() if self.state.opened_at else None,
+            **self.counters,
+        }
+
+    def publish(self):
+        cache.set(METRICS_KEY % self.name, self.metrics(), None)
+
+
+class InMemoryProvider(SMSProvider):
+    """
+    Records sent messages as (recipients, message) tuples in `outbox`.
+    """
 
-africastalking.initialize(username=settings.AT_USERNAME, api_key=settings.AT_API_KEY)
-_sms = africastalking.SMS
+    def __init__(self):
+        self.outbox = []
 
+    def send(self, message, recipients):
+        self.outbox.append((list(recipients), message))
+        return {"SMSMessageData": {"Recipients": [{"number": number} for number in recipients]}}
 
-def send_sms(phone, message):
+
+class NullProvider(SMSProvider):
+    def send(self, message, recipients):
+        return None
+
+
+PROVIDERS = {
+    "africastalking": AfricasTalkingProvider,
+    "memory": InMemoryProvider,
+    "null": NullProvider,
+}
+
+_provider = None
+
+
+def get_sms_provider():
+    """
+    Returns the process-wide provider configured by SMS_PROVIDER.
     """
-    Send an SMS message to a specified phone number using Africa's Talking API.
+    global _provider
+    if _provider is None:
+        name = getattr(settings, "SMS_PROVIDER", "africastalking")
+        provider = (PROVIDERS.get(name) or import_string(name))()
+        _provider = ResilientProvider(provider) if provider.remote else provider
+    return _provider
+
+
+@receiver(setting_changed)
+def reset_sms_provider(setting, **kwargs):
+    global _provider
+    if setting == "SMS" or setting.startswith(("SMS_", "AFRICASTALKING_")):
+        _provider = None
+
+
+def send_sms(phone_number, message):
+    """
+    Send an SMS message through the configured provider.
 
     Args:
-        phone (str): The recipient's phone number in international format.
-        message (str): The text message to be sent.
+        phone_number (str): The recipient's phone number.
+        message (str): The message body.
 
     Returns:
-        dict | None: A response dictionary from Africa's Talking API if successful,
-        otherwise None if an exception occurs.
+        The provider's response if successful, None if sending fails.
     """
     try:
-        response = _sms.send(message, [phone])
-        return response
-    except Exception:
-        return None
+        return get_sms_provider().send(message, [phone_number])
+    except SMSUnavailable as exc:
+        logger.warning("SMS to %s skipped: %s", phone_number, exc)
+    except Exception as exc:
+        logger.warning("SMS to %s failed: %s", phone_number, exc)
+    return None
@@ -0,0 +1,180 @@
+"""
+Stock mutations for inventory items.
+
+All stock changes go through this module so they are applied as atomic
+database-side updates (never read-modify-write) and keep the derived state
+(cached shard totals, inventory ETags) in step.
+
+Hot items can be given several counter shards (`Inventory.counter_shards`).
+Their stock is then spread over InventoryStockShard rows: each change
+updates one randomly chosen shard, so concurrent fulfillments of the same
+item do not all wait on one row lock. `rebalance_stock` periodically evens
+the shards out and refreshes `Inventory.on_hand` with the total.
+
+Every change reports its before/after stock to orders.alerts, which queues
+low-stock alerts on threshold crossings.
+"""
+
+import random
+
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import F, Sum
+
+from .alerts import record_stock_change
+from .conditional import INVENTORY_SCOPE, bump_version
+from .models import Inventory, InventoryStockShard
+
+
+def _update_inventory(inventory_id, using, assignment, params):
+    """
+    Runs `UPDATE ... SET on_hand = <assignment>` on one item and returns the
+    new (on_hand, warn_limit), read back with RETURNING where supported so
+    the change and its result cost a single query.
+    """
+    connection = connections[using]
+    if connection.vendor in ("sqlite", "postgresql"):
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {qn(Inventory._meta.db_table)} SET {qn('on_hand')} = {assignment} "
+                f"WHERE {qn('id')} = %s RETURNING {qn('on_hand')}, {qn('warn_limit')}",
+                [*params, inventory_id],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Inventory.DoesNotExist(f"Inventory {inventory_id} does not exist.")
+        return row
+    queryset = Inventory.objects.using(using).filter(pk=inventory_id)
+    if assignment == "%s":
+        queryset.update(on_hand=params[0])
+    else:
+        queryset.update(on_hand=F("on_hand") + params[0])
+    return queryset.values_list("on_hand", "warn_limit").get()
+
+
+def adjust_stock(inventory, delta, invalidate=True):
+    """
+    Adds `delta` (negative to deduct) to an item's stock.
+
+    Args:
+        inventory (Inventory): The item; `pk`, `counter_shards` and (for
+            sharded items) `warn_limit` are used.
+        delta (int): Quantity to add.
+        invalidate (bool): Bump the inventory ETags; batch callers pass
+            False and bump once for the whole batch.
+
+    Returns:
+        int: The item's stock after the change.
+    """
+    using = router.db_for_write(Inventory, instance=inventory)
+    if inventory.counter_shards:
+        after = _adjust_shard(inventory, delta, using)
+        warn_limit = inventory.warn_limit
+    else:
+        after, warn_limit = _update_inventory(inventory.pk, using, "on_hand + %s", [delta])
+    record_stock_change(inventory.pk, after - delta, after, warn_limit, using)
+    if invalidate:
+        bump_version(INVENTORY_SCOPE, using=using)
+    return after
+
+
+def _adjust_shard(inventory, delta, using):
+    shards = InventoryStockShard.objects.using(using).filter(inventory_id=inventory.pk)
+    start = random.randrange(inventory.counter_shards)
+    order = [(start + offset) % inventory.counter_shards for offset in range(inventory.counter_shards)]
+    updated = 0
+    if delta < 0:
+        # Prefer a shard that can cover the deduction, starting at a random one.
+        for index in order:
+            updated = shards.filter(index=index, on_hand__gte=-delta).update(
+                on_hand=F("on_hand") + delta
+            )
+            if updated:
+                break
+    if not updated:
+        shards.filter(index=start).update(on_hand=F("on_hand") + delta)
+
+    # The cached total is only adjusted once the change commits, so a
+    # rollback leaves it alone; until then the stock level reported to the
+    # alert engine is derived from it without an extra query.
+    key = InventoryStockShard.objects.cache_key % inventory.pk
+    transaction.on_commit(lambda: _incr_cached_total(key, delta), using=using)
+    total = cache.get(key)
+    if total is not None:
+        return total + delta
+    return shards.aggregate(total=Sum("on_hand"))["total"] or 0
+
+
+def _incr_cached_total(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Expired meanwhile; the next read sums the shards again.
+        pass
+
+
+def set_stock(inventory, quantity, invalidate=True):
+    """
+    Sets an item's stock to an absolute quantity. The previous level used
+    for alerting is the one loaded on `inventory`. `invalidate` is as for
+    `adjust_stock`.
+
+    Returns:
+        int: The item's stock after the change.
+    """
+    before = inventory.stock_level()
+    using = router.db_for_write(Inventory, instance=inventory)
+    if inventory.counter_shards:
+        rebalance_stock(inventory, total=quantity, invalidate=invalidate)
+        warn_limit = inventory.warn_limit
+    else:
+        quantity, warn_limit = _update_inventory(inventory.pk, using, "%s", [quantity])
+        if invalidate:
+            bump_version(INVENTORY_SCOPE, using=using)
+    record_stock_change(inventory.pk, before, quantity, warn_limit, using)
+    return quantity
+
+
+def rebalance_stock(inventory, total=None, invalidate=True):
+    """
+    Spreads an item's stock evenly over its `counter_shards` shards (adding
+    or removing shard rows as needed) and stores the total in `on_hand`.
+    With `counter_shards` set to 0, folds the shards back into `on_hand`.
+
+    Args:
+        inventory (Inventory): The item to rebalance.
+        total (int | None): New absolute stock; defaults to the current total.
+        invalidate (bool): Bump the inventory ETags.
+    """
+    using = router.db_for_write(Inventory, instance=inventory)
+    with transaction.atomic(using=using):
+        shards = InventoryStockShard.objects.using(using).filter(inventory_id=inventory.pk)
+        # Lock the shard rows so no deduction lands between summing and rewriting.
+        current = list(shards.select_for_update().values_list("on_hand", flat=True))
+        if total is None:
+            if current:
+                total = sum(current)
+            else:
+                total = Inventory.objects.using(using).values_list("on_hand", flat=True).get(pk=inventory.pk)
+
+        count = inventory.counter_shards
+        shards.filter(index__gte=count).delete()
+        share, remainder = divmod(total, count) if count else (0, 0)
+        for index in range(count):
+            InventoryStockShard.objects.using(using).update_or_create(
+                inventory_id=inventory.pk,
+                index=index,
+                defaults={"on_hand": share + (1 if index < remainder else 0)},
+            )
+        Inventory.objects.using(using).filter(pk=inventory.pk).update(
+            on_hand=total, counter_shards=count
+        )
+        inventory.on_hand = total
+        transaction.on_commit(
+            lambda: cache.delete(InventoryStockShard.objects.cache_key % inventory.pk),
+            using=using,
+        )
+        if invalidate:
+            bump_version(INVENTORY_SCOPE, using=using)
+    return total
@@ -0,0 +1,15 @@
+"""
+Celery tasks for the orders app, scheduled by CELERY_BEAT_SCHEDULE.
+"""
+
+from celery import shared_task
+
+from .expiry import expire_drafts
+
+
+@shared_task
+def expire_draft_orders():
+    """
+    Cancels DRAFT orders older than DRAFT_ORDER_TTL_HOURS.
+    """
+    return expire_drafts()
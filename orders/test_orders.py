@@ -1,10 +1,10 @@
 import pytest
 from django.urls import reverse
 from rest_framework.test import APIClient
-from unittest.mock import patch
+from django.conf import settings as django_settings
 
 
-@pytest.mark.django_db
+@pytest.mark.django_db(databases="__all__")
 def test_customer_registration():
     """
     Test that a customer can successfully register.
@@ -30,7 +30,7 @@ def test_customer_registration():
     assert response.data["phone_number"].endswith("5678")
 
 
-@pytest.mark.django_db
+@pytest.mark.django_db(databases="__all__")
 def test_token_authentication(customer_factory, django_user_model):
     """
     Test that a user can obtain JWT tokens via the authentication endpoint.
@@ -52,9 +52,8 @@ def test_token_authentication(customer_factory, django_user_model):
     assert "refresh" in response.data
 
 
-@pytest.mark.django_db
-@patch("orders.signals.sms.send")
-def test_order_creation(mock_sms, customer_factory, inventory_factory, auth_client):
+@pytest.mark.django_db(databases="__all__")
+def test_order_creation(customer_factory, inventory_factory, auth_client, sms_outbox):
     """
     Test order creation process with valid customer and inventory.
 
@@ -79,10 +78,1278 @@ def test_order_creation(mock_sms, customer_factory, inventory_factory, auth_clie
     assert response.status_code == 201
 
     from orders.models import Order
-    order = Order.objects.get(id=response.data["id"])
+    from orders.sharding import customer_db
+    order = Order.objects.using(customer_db(customer)).get(id=response.data["id"])
     assert order.customer == customer
     assert order.items.count() == 1
     assert order.items.first().inventory == inventory
     assert order.items.first().quantity == 2
 
-    assert mock_sms.call_count >= 1
+    assert len(sms_outbox) >= 1
+
+
+def test_token_bucket_throttle_refills_over_time():
+    """
+    Test that the token bucket allows a burst, refuses the next request
+    and admits requests again once tokens have been refilled.
+    """
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.request import Request
+    from unittest.mock import patch
+    from django.contrib.auth.models import AnonymousUser
+    from orders.throttling import TokenBucketThrottle
+
+    clock = {"now": 1000.0}
+
+    class TestThrottle(TokenBucketThrottle):
+        scope = "test"
+        rate = "3/min"
+        timer = staticmethod(lambda: clock["now"])
+
+    request = Request(APIRequestFactory().get("/api/inventory/"))
+    request.user = AnonymousUser()
+
+    assert all(TestThrottle().allow_request(request, None) for _ in range(3))
+    throttle = TestThrottle()
+    assert throttle.allow_request(request, None) is False
+    assert throttle.wait() == pytest.approx(20, abs=0.01)
+
+    clock["now"] += 20
+    assert TestThrottle().allow_request(request, None) is True
+    assert TestThrottle().allow_request(request, None) is False
+
+    # The key is kept alive on every accepted request, never only when
+    # the bucket is half empty, so it cannot expire while in debt.
+    class BurstThrottle(TestThrottle):
+        scope = "burst"
+        rate = "6/min"
+
+    with patch.object(TestThrottle.cache, "touch", wraps=TestThrottle.cache.touch) as touch:
+        assert BurstThrottle().allow_request(request, None) is True
+        throttle = BurstThrottle()
+        assert throttle.allow_request(request, None) is True
+    assert [call.args for call in touch.call_args_list] == [(throttle.key, 60)]
+
+
+def test_shared_cache_check(settings):
+    """
+    Test that a per-process cache fails the orders.E001 check outside DEBUG.
+    """
+    from orders.checks import check_shared_cache
+
+    settings.DEBUG = False
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    assert [error.id for error in check_shared_cache(None)] == ["orders.E001"]
+
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                                   "LOCATION": "redis://127.0.0.1:6379"}}
+    assert check_shared_cache(None) == []
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_load_shedding_spares_order_creation(settings, customer_factory, auth_client):
+    """
+    Test that an overloaded process sheds low-priority requests with a 503
+    and Retry-After, while order creation is still served.
+    """
+    from orders.middleware import monitor
+
+    customer_factory(user=auth_client.handler._force_user)
+    settings.LOAD_SHEDDING = {"MAX_IN_FLIGHT": 0, "RETRY_AFTER": 7}
+    try:
+        response = auth_client.get(reverse("inventory-list"))
+        assert response.status_code == 503
+        assert response["Retry-After"] == "7"
+
+        response = auth_client.post(reverse("order-list"), {"items": []}, format="json")
+        assert response.status_code == 201
+    finally:
+        monitor.reset()
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_inventory_conditional_get(settings, auth_client, inventory_factory, django_assert_num_queries,
+                                   django_capture_on_commit_callbacks, shared_cache):
+    """
+    Test ETag support on the inventory list.
+
+    Steps:
+    - Fetch the list and check ETag and Last-Modified headers are present.
+    - Repeat with If-None-Match and expect a 304 without any DB query.
+    - Update an item and expect the old ETag to no longer match.
+    - Versions expire after ETAG_VERSION_TTL.
+    - With a per-process cache no ETags are sent at all.
+    """
+    from unittest.mock import patch
+    from django.core.cache import cache
+    from orders.conditional import INVENTORY_SCOPE, VERSION_KEY
+
+    with django_capture_on_commit_callbacks(execute=True):
+        inventory = inventory_factory(on_hand=10)
+    url = reverse("inventory-list")
+
+    response = auth_client.get(url)
+    assert response.status_code == 200
+    etag = response["ETag"]
+    assert response["Last-Modified"]
+
+    with django_assert_num_queries(0):
+        response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        inventory.on_hand = 3
+        inventory.save()
+
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+    assert response.data[0]["on_hand"] == 3
+
+    settings.ETAG_VERSION_TTL = 60
+    with patch.object(cache, "set_many", wraps=cache.set_many) as set_many, \
+            django_capture_on_commit_callbacks(execute=True):
+        inventory.save()
+    assert set_many.call_args.args[1] == 60
+    assert VERSION_KEY % INVENTORY_SCOPE in set_many.call_args.args[0]
+
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+    assert response.status_code == 200 and "ETag" not in response
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_order_etag_ignores_stock_changes(auth_client, customer_factory, inventory_factory,
+                                          django_capture_on_commit_callbacks, shared_cache):
+    """
+    Test that order ETags only depend on inventory names.
+
+    Steps:
+    - Fetch the customer's orders and keep the ETag.
+    - Change the stock of an ordered item, directly and by saving it: the
+      ETag still matches.
+    - Rename the item: the ETag no longer matches.
+    """
+    from orders.stock import adjust_stock
+
+    customer = customer_factory(user=auth_client.handler._force_user)
+    with django_capture_on_commit_callbacks(execute=True):
+        inventory = inventory_factory(on_hand=10)
+        customer.orders.create().items.create(inventory=inventory, quantity=1)
+    url = reverse("order-list")
+    etag = auth_client.get(url)["ETag"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        adjust_stock(inventory, -2)
+        inventory.refresh_from_db()
+        inventory.warn_limit = 2
+        inventory.save()
+    assert auth_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        inventory.name = "Item B"
+        inventory.save()
+    response = auth_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data[0]["items"][0]["inventory_name"] == "Item B"
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_order_version_bumps_are_batched(customer_factory, django_capture_on_commit_callbacks):
+    """
+    Test that saving orders and items does not look up the customer's user
+    per save: the user ids are resolved once, when the transaction commits.
+    """
+    from django.db import DEFAULT_DB_ALIAS, connection, transaction
+    from django.core.cache import cache
+    from django.test.utils import CaptureQueriesContext
+    from orders.conditional import VERSION_KEY, orders_scope
+    from orders.models import Order, OrderItem, Inventory
+    from orders.sharding import customer_db
+
+    customer = customer_factory()
+    inventory = Inventory.objects.create(name="Bolt", on_hand=50)
+    for _ in range(3):
+        customer.orders.create().items.create(inventory=inventory, quantity=1)
+    key = VERSION_KEY % orders_scope(customer.user_id)
+    cache.delete(key)
+    using = customer_db(customer) or DEFAULT_DB_ALIAS
+
+    # Customers always live on the default database (`connection`).
+    with django_capture_on_commit_callbacks() as callbacks:
+        with CaptureQueriesContext(connection) as saves, transaction.atomic(using=using):
+            for order in Order.objects.using(using):
+                order.save()
+            for item in OrderItem.objects.using(using):
+                item.save()
+    assert not any('"orders_customer"' in query["sql"] for query in saves.captured_queries)
+    assert cache.get(key) is None
+
+    with CaptureQueriesContext(connection) as flush:
+        for callback in callbacks:
+            callback()
+    assert sum('"orders_customer"' in query["sql"] for query in flush.captured_queries) == 1
+    assert cache.get(key) is not None
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_fast_list_matches_serializers(customer_factory, inventory_factory):
+    """
+    Test that the serializer-free list path renders exactly what the
+    serializers render for customers, inventory and transactions.
+    """
+    from orders.fast_reads import (
+        CUSTOMER_FIELDS, INVENTORY_FIELDS, TRANSACTION_FIELDS, render_rows,
+    )
+    from orders.models import Customer, Inventory
+    from orders.serializers import (
+        CustomerSerializer, InventorySerializer, TransactionSerializer,
+    )
+
+    customer = customer_factory(name="Zoë")
+    inventory_factory(name="Item A", on_hand=0)
+    inventory_factory(name="Item B", on_hand=3, warn_limit=5)
+    inventory_factory(name="Item C", on_hand=30)
+    order = customer.orders.create()
+    order.state = "CANCELLED"
+    order.save()
+
+    for queryset, serializer, fields in [
+        (Customer.objects.all(), CustomerSerializer, CUSTOMER_FIELDS),
+        (Inventory.objects.all(), InventorySerializer, INVENTORY_FIELDS),
+        (order.transactions.all(), TransactionSerializer, TRANSACTION_FIELDS),
+    ]:
+        queryset = queryset.order_by("id")
+        expected = [dict(row) for row in serializer(queryset, many=True).data]
+        assert render_rows(queryset, fields) == expected
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_fast_inventory_list_batches_shard_totals(inventory_factory, django_assert_num_queries):
+    """
+    Test that the serializer-free inventory list resolves the stock of
+    sharded items once per list.
+
+    Steps:
+    - With nothing cached, several sharded items cost one cache read and one
+      grouped query, and their status follows the shard totals.
+    - Once cached, only the list query runs.
+    """
+    from unittest.mock import patch
+    from django.core.cache import cache
+    from orders.fast_reads import INVENTORY_FIELDS, render_rows
+    from orders.models import Inventory
+    from orders.stock import rebalance_stock
+
+    inventory_factory(name="Plain", on_hand=7)
+    for name, total in [("Item A", 0), ("Item B", 3), ("Item C", 30)]:
+        rebalance_stock(inventory_factory(name=name, on_hand=0, counter_shards=3), total)
+    Inventory.objects.filter(counter_shards=3).update(on_hand=99)  # stale row value
+    queryset = Inventory.objects.order_by("id")
+    cache.clear()
+
+    with patch.object(cache, "get_many", wraps=cache.get_many) as get_many, \
+            django_assert_num_queries(2):
+        rows = render_rows(queryset, INVENTORY_FIELDS)
+    assert get_many.call_count == 1
+    assert [(row["on_hand"], row["status"]) for row in rows] == [
+        (7, "Available"), (0, "Out of stock"), (3, "Few remaining"), (30, "Available"),
+    ]
+
+    with django_assert_num_queries(1):
+        assert render_rows(queryset, INVENTORY_FIELDS) == rows
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_sparse_fieldsets_prune_payload_and_sql(customer_factory, inventory_factory,
+                                                auth_client, django_assert_num_queries):
+    """
+    Test `?fields=` / `?omit=` on the viewsets.
+
+    Steps:
+    - Request orders with only id and state: no items are returned or loaded.
+    - Request inventory omitting columns: the SQL selects only what is needed.
+    - Request an unknown field and expect a 400.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    customer = customer_factory(user=auth_client.handler._force_user)
+    inventory = inventory_factory()
+    order = customer.orders.create()
+    order.items.create(inventory=inventory, quantity=1)
+
+    # One query resolves the customer, one loads the orders; items are skipped.
+    with django_assert_num_queries(2):
+        response = auth_client.get(reverse("order-list"), {"fields": "id,state"})
+    assert response.status_code == 200
+    assert response.data == [{"id": order.id, "state": "DRAFT"}]
+
+    response = auth_client.get(reverse("order-detail", args=[order.id]), {"omit": "created_at"})
+    assert list(response.data) == ["id", "state", "items"]
+    assert response.data["items"][0]["inventory_name"] == inventory.name
+
+    with CaptureQueriesContext(connection) as queries:
+        response = auth_client.get(reverse("inventory-list"), {"fields": "id,name"})
+    assert response.json() == [{"id": inventory.id, "name": inventory.name}]
+    assert "on_hand" not in queries.captured_queries[-1]["sql"]
+
+    response = auth_client.get(reverse("transaction-detail", args=[order.transactions.first().id]),
+                               {"fields": "order,action"})
+    assert response.data == {"order": order.id, "action": "CREATE_ORDER"}
+
+    response = auth_client.get(reverse("inventory-list"), {"fields": "id,secret"})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_filter_combinations_use_indexes(customer_factory):
+    """
+    Test that every filter combination accepted by a viewset is executed as
+    an index search, and that combinations without an index are rejected.
+
+    Steps:
+    - Enumerate every subset of each viewset's filters.
+    - Accepted subsets: the query plan must not contain a table scan, and
+      the index searched must constrain every filtered column.
+    - Rejected subsets: the backend must raise a validation error.
+    """
+    from itertools import combinations
+    from rest_framework.exceptions import ValidationError
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+    from orders.filters import IndexedFilterBackend, is_indexed
+    from orders.models import Inventory, Order, Transaction
+    from orders.views import InventoryViewSet, OrderViewSet, TransactionViewSet
+
+    customer = customer_factory()
+    samples = {
+        "name_prefix": "Ite",
+        "state": "PLACED",
+        "created_after": "2025-01-01T00:00:00Z",
+        "created_before": "2025-02-01T00:00:00Z",
+        "action": "CREATE_ORDER",
+        "order": "1",
+    }
+    cases = [
+        (InventoryViewSet, Inventory.objects.all()),
+        (OrderViewSet, Order.objects.filter(customer=customer)),
+        (TransactionViewSet, Transaction.objects.all()),
+    ]
+
+    for view_class, base_queryset in cases:
+        view = view_class()
+        names = list(view.indexed_filters)
+        assert set(names) <= set(samples), "add a sample value for new filters"
+        for size in range(1, len(names) + 1):
+            for subset in combinations(names, size):
+                request = Request(APIRequestFactory().get("/", {name: samples[name] for name in subset}))
+                backend = IndexedFilterBackend()
+                active = [view.indexed_filters[name] for name in subset]
+                if not is_indexed(active, view.filter_indexes):
+                    with pytest.raises(ValidationError):
+                        backend.filter_queryset(request, base_queryset, view)
+                    continue
+                queryset = backend.filter_queryset(request, base_queryset, view)
+                plan = queryset.explain()
+                assert "SEARCH" in plan and "SCAN" not in plan, (view_class.__name__, subset, plan)
+                search = next(line for line in plan.splitlines() if "SEARCH" in line)
+                for f in active:
+                    column = queryset.model._meta.get_field(f.column).column
+                    assert column in search.partition("(")[2], (view_class.__name__, subset, plan)
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_order_filters(customer_factory, auth_client):
+    """
+    Test filtering orders by state and creation time, and rejecting
+    invalid values.
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+    from orders.models import Order
+    from orders.sharding import customer_db
+
+    customer = customer_factory(user=auth_client.handler._force_user)
+    now = timezone.now()
+    old, placed = Order.objects.using(customer_db(customer)).bulk_create([
+        Order(customer=customer, created_at=now - timedelta(days=10)),
+        Order(customer=customer, state="PLACED", created_at=now),
+    ])
+    url = reverse("order-list")
+
+    response = auth_client.get(url, {"state": "PLACED", "fields": "id"})
+    assert response.data == [{"id": placed.id}]
+
+    after = (now - timedelta(days=1)).isoformat()
+    response = auth_client.get(url, {"created_after": after, "fields": "id"})
+    assert response.data == [{"id": placed.id}]
+
+    assert auth_client.get(url, {"state": "BOGUS"}).status_code == 400
+    assert auth_client.get(url, {"created_after": "yesterday"}).status_code == 400
+
+
+@pytest.mark.django_db(transaction=True, databases="__all__")
+def test_replica_router_read_your_writes(settings, django_user_model):
+    """
+    Test the read-replica router decisions.
+
+    Steps:
+    - A plain read goes to a replica, a write to the primary.
+    - Reads inside a transaction, or after a write in the same request,
+      go to the primary.
+    - After the request ends, the writing user stays pinned to the primary
+      while other users read from replicas again.
+    """
+    from unittest.mock import patch
+    from django.db import transaction
+    from django.test import RequestFactory
+    from orders import db_routers
+    from orders.models import Inventory
+
+    settings.DATABASE_REPLICAS = ["replica_0"]
+    router = db_routers.PrimaryReplicaRouter()
+    writer = django_user_model.objects.create_user(username="writer")
+    reader = django_user_model.objects.create_user(username="reader")
+
+    def request_for(user):
+        request = RequestFactory().get("/")
+        request.user = user
+        return request
+
+    token = db_routers.begin_request(request_for(writer))
+    assert router.db_for_read(Inventory) == "replica_0"
+    with transaction.atomic():
+        assert router.db_for_read(Inventory) == "default"
+    assert router.db_for_write(Inventory) == "default"
+    assert router.db_for_read(Inventory) == "default"
+    db_routers.end_request(token)
+
+    token = db_routers.begin_request(request_for(writer))
+    assert router.db_for_read(Inventory) == "default"
+    db_routers.end_request(token)
+
+    token = db_routers.begin_request(request_for(reader))
+    with patch.object(db_routers.cache, "get", wraps=db_routers.cache.get) as cache_get:
+        assert router.db_for_read(Inventory) == "replica_0"
+        assert router.db_for_read(Inventory) == "replica_0"
+    assert cache_get.call_count == 1
+    db_routers.end_request(token)
+
+
+def test_replicas_with_sqlite_files(tmp_path):
+    """
+    Test replica routing end to end with two real SQLite files, in a
+    separate process configured through SQLITE_PATH / SQLITE_REPLICA_PATHS.
+
+    Steps:
+    - Migrate the primary, seed it and copy it with sync_replicas.
+    - Add a row to the primary only: reads through the API still come from
+      the replica and do not see it.
+    - After an API write, the writer reads from the primary (and sees both
+      rows) while another user keeps reading from the replica.
+    """
+    import os
+    import subprocess
+    import sys
+    import textwrap
+
+    script = textwrap.dedent("""
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django.test.utils import setup_test_environment
+        from rest_framework.test import APIClient
+        from orders.models import Inventory
+
+        setup_test_environment()
+        call_command("migrate", verbosity=0)
+        writer = User.objects.create_user("writer")
+        reader = User.objects.create_user("reader")
+        Inventory.objects.create(name="Synced", on_hand=1)
+        call_command("sync_replicas", verbosity=0)
+        Inventory.objects.create(name="Unsynced", on_hand=1)
+
+        def names(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            return sorted(item["name"] for item in client.get("/api/inventory/").json())
+
+        assert names(writer) == ["Synced"], names(writer)
+        client = APIClient()
+        client.force_authenticate(writer)
+        assert client.post("/api/inventory/", {"name": "Fresh"}, format="json").status_code == 201
+        assert names(writer) == ["Fresh", "Synced", "Unsynced"], names(writer)
+        assert names(reader) == ["Synced"], names(reader)
+        print("replicas ok")
+    """)
+    env = {key: value for key, value in os.environ.items() if key != "ORDER_SHARD_COUNT"}
+    env.update(
+        SQLITE_PATH=str(tmp_path / "primary.sqlite3"),
+        SQLITE_REPLICA_PATHS=str(tmp_path / "replica.sqlite3"),
+        SMS_PROVIDER="null",
+        AUTH0_DOMAIN=env.get("AUTH0_DOMAIN", "test"),
+        AUTH0_AUDIENCE=env.get("AUTH0_AUDIENCE", "test"),
+    )
+    result = subprocess.run(
+        [sys.executable, "manage.py", "shell", "-c", script],
+        cwd=django_settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "replicas ok" in result.stdout
+
+
+def test_shard_router_routes_by_customer(settings):
+    """
+    Test that order data is routed to the shard of its customer, and that
+    non-sharded models reached from a sharded row go to the default database.
+    """
+    from orders.models import Customer, Inventory, Order, OrderItem
+    from orders.sharding import OrderShardRouter, shard_for_customer
+
+    settings.ORDER_SHARDS = ["shard_0", "shard_1"]
+    router = OrderShardRouter()
+
+    assert shard_for_customer(4) == "shard_0"
+    assert shard_for_customer(7) == "shard_1"
+
+    order = Order(customer_id=7)
+    assert router.db_for_write(Order, instance=order) == "shard_1"
+    assert router.db_for_write(Order, instance=Customer(pk=4)) == "shard_0"
+
+    item = OrderItem(order=order)
+    assert router.db_for_write(OrderItem, instance=item) == "shard_1"
+
+    item._state.db = "shard_1"
+    assert router.db_for_read(Inventory, instance=item) == "default"
+    assert router.db_for_read(Inventory) is None
+    assert router.allow_migrate("shard_0", "orders") is True
+    assert router.allow_migrate("shard_0", "auth") is False
+
+
+@pytest.mark.skipif(not django_settings.ORDER_SHARDS, reason="run with ORDER_SHARD_COUNT=2 to test shards")
+@pytest.mark.django_db(databases="__all__")
+def test_sharded_order_placement_and_resharding(customer_factory, inventory_factory,
+                                                auth_client):
+    """
+    Test order placement on real shard databases.
+
+    Steps:
+    - Only the shards drop the cross-database foreign keys.
+    - Create an order through the API and check it lands on the customer's
+      shard, with an id from the shard's range.
+    - Place legacy orders on the default database and move them with
+      the reshard_orders command, keeping their ids and the timestamps of
+      their transactions.
+    - A legacy order whose id is taken on the target shard is moved with
+      new ids from the shard's range instead of being skipped.
+    """
+    from datetime import timedelta
+    from io import StringIO
+    from django.core.management import call_command
+    from django.db import connections
+    from django.utils import timezone
+    from orders.models import Order, Transaction
+    from orders.sharding import id_range, shard_for_customer
+
+    customer = customer_factory(user=auth_client.handler._force_user)
+    inventory = inventory_factory()
+    shard = shard_for_customer(customer.id)
+    first, last = id_range(shard)
+
+    for alias, constrained in [("default", True), (shard, False)]:
+        with connections[alias].cursor() as cursor:
+            relations = connections[alias].introspection.get_relations(cursor, "orders_order")
+        assert ("customer_id" in relations) is constrained, alias
+
+    response = auth_client.post(
+        reverse("order-list"),
+        {"items": [{"inventory_id": inventory.id, "quantity": 1}]},
+        format="json",
+    )
+    assert response.status_code == 201
+    assert first <= response.data["id"] <= last
+    assert Order.objects.using(shard).filter(customer=customer).count() == 1
+    assert Transaction.objects.using(shard).filter(order__customer=customer).exists()
+    assert not Order.objects.using("default").exists()
+    assert len(auth_client.get(reverse("order-list")).data) == 1
+
+    long_ago = timezone.now() - timedelta(days=30)
+    legacy, = Order.objects.using("default").bulk_create([Order(id=1000, customer=customer)])
+    legacy.transactions.create(action="CREATE_ORDER")
+    Transaction.objects.using("default").update(timestamp=long_ago)
+    call_command("reshard_orders", stdout=StringIO())
+    assert not Order.objects.using("default").exists()
+    moved = Order.objects.using(shard).get(pk=legacy.pk)
+    assert list(moved.transactions.values_list("timestamp", flat=True)) == [long_ago]
+
+    neighbour = customer.pk + len(django_settings.ORDER_SHARDS)
+    Order.objects.using(shard).bulk_create([Order(id=2000, customer_id=neighbour)])
+    clash = Order.objects.using("default").create(id=2000, customer=customer)
+    Transaction.objects.using("default").update(timestamp=long_ago)
+    output = StringIO()
+    call_command("reshard_orders", stdout=output)
+    assert "Moved 1 customer(s), 1 of them re-keyed." in output.getvalue()
+    assert Order.objects.using(shard).get(pk=2000).customer_id == neighbour
+    moved = Order.objects.using(shard).filter(customer=customer).latest("id")
+    assert first <= moved.pk <= last
+    assert list(moved.transactions.values_list("action", "timestamp")) == [("CREATE_ORDER", long_ago)]
+    assert clash.pk == 2000 and not Order.objects.using("default").exists()
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_sharded_stock_counter(customer_factory, inventory_factory, auth_client,
+                               django_capture_on_commit_callbacks):
+    """
+    Test sharded stock counters for a hot item.
+
+    Steps:
+    - Spread an item's stock over 4 shards.
+    - Fulfill an order: the deduction lands on a shard, and the API and
+      get_status report the summed stock.
+    - A rolled-back deduction leaves the cached total alone.
+    - Rebalance: shards are even again and on_hand holds the total.
+    """
+    from django.core.management import call_command
+    from django.db import transaction
+    from orders.stock import adjust_stock
+
+    customer = customer_factory()
+    inventory = inventory_factory(on_hand=10, warn_limit=5)
+    call_command("rebalance_stock", item=inventory.id, shards=4)
+    assert sorted(inventory.stock_shards.values_list("on_hand", flat=True)) == [2, 2, 3, 3]
+
+    order = customer.orders.create()
+    order.items.create(inventory=inventory, quantity=6)
+    with django_capture_on_commit_callbacks(execute=True):
+        order.state = "FULFILLED"
+        order.save()
+
+    inventory.refresh_from_db()
+    assert inventory.on_hand == 10  # the row itself is only refreshed on rebalance
+    assert inventory.stock_level() == 4
+    assert inventory.get_status() == "Few remaining"
+
+    data = auth_client.get(reverse("inventory-detail", args=[inventory.id])).data
+    assert (data["on_hand"], data["status"]) == (4, "Few remaining")
+    row, = auth_client.get(reverse("inventory-list")).json()
+    assert (row["on_hand"], row["status"]) == (4, "Few remaining")
+
+    with pytest.raises(RuntimeError), transaction.atomic():
+        assert adjust_stock(inventory, -1) == 3
+        raise RuntimeError
+    assert inventory.stock_level() == 4
+
+    call_command("rebalance_stock")
+    inventory.refresh_from_db()
+    assert inventory.on_hand == 4
+    assert sorted(inventory.stock_shards.values_list("on_hand", flat=True)) == [1, 1, 1, 1]
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_low_stock_alerts(settings, customer_factory, inventory_factory, sms_outbox,
+                          django_assert_num_queries, django_capture_on_commit_callbacks):
+    """
+    Test the low-stock alert engine.
+
+    Steps:
+    - Fulfill an order that takes an item below its warning limit: one alert
+      is queued.
+    - A stock change that crosses nothing costs a single query.
+    - Cross the same threshold again: the alert is debounced.
+    - Restocking an empty item to below its warning limit raises no alert.
+    - While the SMS provider refuses sends, the alerts stay pending.
+    - Run the consumer while the webhook channel fails: staff receive one
+      batched SMS and the alerts stay pending.
+    - Run it again: only the webhook is retried, and the queue drains.
+    """
+    from unittest.mock import patch
+    import requests
+    from django.core.management import call_command
+    from django.core.cache import cache
+    from orders.models import StockAlert
+    from orders.sms import SMSUnavailable
+    from orders.stock import adjust_stock
+
+    settings.STOCK_ALERT_CHANNELS = ["sms"]
+    settings.STOCK_ALERT_SMS_RECIPIENTS = ["+254700000001"]
+    customer = customer_factory()
+    inventory = inventory_factory(name="Widget", on_hand=8, warn_limit=5)
+    order = customer.orders.create()
+    order.items.create(inventory=inventory, quantity=4)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        order.state = "FULFILLED"
+        order.save()
+    alert = StockAlert.objects.get()
+    assert (alert.level, alert.on_hand) == ("LOW_STOCK", 4)
+
+    with django_assert_num_queries(1):
+        assert adjust_stock(inventory, 1) == 5
+    with django_capture_on_commit_callbacks(execute=True):
+        adjust_stock(inventory, -1)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        adjust_stock(inventory, 10)
+        adjust_stock(inventory, -10)
+    assert StockAlert.objects.count() == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert adjust_stock(inventory, -4) == 0
+    assert StockAlert.objects.filter(level="OUT_OF_STOCK").count() == 1
+
+    cache.clear()  # no debounce hides an alert for the improvement
+    with django_capture_on_commit_callbacks(execute=True):
+        assert adjust_stock(inventory, 3) == 3
+    assert StockAlert.objects.count() == 2
+
+    sms_outbox.clear()
+    with patch("orders.sms.InMemoryProvider.send", side_effect=SMSUnavailable("sms circuit is open")):
+        call_command("process_stock_alerts")
+    assert StockAlert.objects.filter(processed_at__isnull=True, sent_channels=[]).count() == 2
+
+    settings.STOCK_ALERT_CHANNELS = ["sms", "webhook"]
+    settings.STOCK_ALERT_WEBHOOK_URL = "http://127.0.0.1:9/alerts"
+    with patch("requests.post", side_effect=requests.ConnectionError) as post:
+        call_command("process_stock_alerts")
+    assert post.call_count == 1
+    assert len(sms_outbox) == 1
+    recipients, message = sms_outbox[0]
+    assert recipients == ["+254700000001"]
+    assert "Widget: low stock (4 left)" in message and "Widget: out of stock (0 left)" in message
+    assert StockAlert.objects.filter(processed_at__isnull=True).count() == 2
+
+    with patch("requests.post") as post:
+        call_command("process_stock_alerts")
+    assert len(post.call_args.kwargs["json"]["alerts"]) == 2
+    assert len(sms_outbox) == 1
+    assert not StockAlert.objects.filter(processed_at__isnull=True).exists()
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_order_event_feed(customer_factory, auth_client):
+    """
+    Test the Server-Sent Events change feed.
+
+    Steps:
+    - Anonymous requests are rejected.
+    - The poller picks up new transactions with their order's customer, and
+      the backlog after a Last-Event-ID only holds that customer's events.
+    - A lower id committed after a higher one was polled is still delivered.
+    - A stream replays the backlog page by page until it is drained, then
+      receives live events for its own customer only, skipping events it
+      already sent.
+    """
+    import asyncio
+    from orders.events import ChangeFeed, event_stream
+
+    response = APIClient().get(reverse("order-events"), HTTP_ACCEPT="text/event-stream")
+    assert response.status_code == 401
+
+    customer = customer_factory()
+    other = customer_factory(user=auth_client.handler._force_user, code="CUST002",
+                             phone_number="0712345679")
+    feed = ChangeFeed()
+    feed.cursors = feed.latest_ids()
+    order = customer.orders.create()
+    other.orders.create()
+    events = feed.fetch()
+    backlog = [e for e in events if e["customer_id"] == customer.pk]
+    assert [(e["order"], e["action"]) for e in backlog] == [(order.pk, "CREATE_ORDER")]
+    assert feed.fetch() == []
+    first = backlog[0]["id"] - 1
+    assert [e["customer_id"] for e in feed.backlog(customer, first)] == [customer.pk]
+
+    # Deleting the lower row stands in for a transaction still open while
+    # the higher one is polled.
+    late = order.transactions.create(action="SUBMIT_ORDER").pk
+    order.transactions.create(action="FULFILL_ORDER")
+    order.transactions.filter(pk=late).delete()
+    assert [e["action"] for e in feed.fetch()] == ["FULFILL_ORDER"]
+    order.transactions.create(id=late, action="SUBMIT_ORDER")
+    assert [e["id"] for e in feed.fetch()] == [late]
+    assert feed.fetch() == []
+
+    backlog = feed.backlog(customer, first)
+    assert [e["action"] for e in backlog] == ["CREATE_ORDER", "FULFILL_ORDER", "SUBMIT_ORDER"]
+    live = {**backlog[0], "id": backlog[-1]["id"] + 10, "action": "SUBMIT_ORDER"}
+
+    class StubFeed(ChangeFeed):
+        async def run(self):
+            pass
+
+        def backlog(self, customer, after_id, limit=1000):
+            # Pages of one event, in backlog order.
+            ids = [e["id"] for e in backlog]
+            start = ids.index(after_id) + 1 if after_id in ids else 0
+            return backlog[start:start + 1]
+
+    async def consume():
+        stub = StubFeed()
+        stream = event_stream(customer, first, change_feed=stub, heartbeat=5)
+        messages = [await stream.__anext__() for _ in range(4)]
+        stub.publish([{**live, "customer_id": other.pk}, backlog[0], live])
+        messages.append(await stream.__anext__())
+        await stream.aclose()
+        assert not stub.subscribers
+        return messages
+
+    *replayed, connected, pushed = asyncio.run(consume())
+    assert [message.split("\n")[1] for message in replayed] == [
+        "event: CREATE_ORDER", "event: FULFILL_ORDER", "event: SUBMIT_ORDER",
+    ]
+    assert replayed[0].startswith(f"id: {backlog[0]['id']}\n")
+    assert connected == ": connected\n\n"
+    assert pushed.startswith(f"id: {live['id']}\nevent: SUBMIT_ORDER\n")
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_webhook_dispatch(settings, customer_factory, django_capture_on_commit_callbacks):
+    """
+    Test webhook queuing, signed delivery, retries and the circuit breaker
+    against a local stub receiver.
+
+    Steps:
+    - Creating an order queues one delivery per subscribed endpoint.
+    - A dispatcher claims the deliveries it picks: another one finds none due.
+    - Dispatch delivers to the healthy endpoint with a valid signature and
+      schedules a retry for the failing one.
+    - Repeated failures open the failing endpoint's circuit; its deliveries
+      are held back until a half-open probe succeeds.
+    """
+    import hashlib
+    import hmac
+    import json
+    import threading
+    from datetime import timedelta
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from django.utils import timezone
+    from orders.models import WebhookDelivery, WebhookEndpoint
+    from orders.webhooks import dispatch_webhooks, due_deliveries, get_breaker
+
+    received, failing = [], {"/fail"}
+
+    class Receiver(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, self.headers["X-Webhook-Signature"], body))
+            self.send_response(500 if self.path in failing else 204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Receiver)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    settings.WEBHOOKS = {"FAILURE_THRESHOLD": 2, "CIRCUIT_RESET_SECONDS": 60, "WORKERS": 2}
+    try:
+        ok = WebhookEndpoint.objects.create(url=f"{base}/ok", secret="s3cret", events=["CREATE_ORDER"])
+        bad = WebhookEndpoint.objects.create(url=f"{base}/fail", secret="x")
+        with django_capture_on_commit_callbacks(execute=True):
+            order = customer_factory().orders.create()
+        assert WebhookDelivery.objects.filter(endpoint=ok).count() == 1
+        assert WebhookDelivery.objects.filter(endpoint=bad).count() == 1
+
+        now = timezone.now()
+        assert len(due_deliveries(10, get_breaker(), now, 60)) == 2
+        assert due_deliveries(10, get_breaker(), now, 60) == []
+        WebhookDelivery.objects.update(next_attempt_at=now)
+
+        assert dispatch_webhooks() == {"delivered": 1, "failed": 1}
+        path, signature, body = next(r for r in received if r[0] == "/ok")
+        timestamp, digest = (part.split("=", 1)[1] for part in signature.split(","))
+        expected = hmac.new(b"s3cret", f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+        assert digest == expected
+        assert json.loads(body)["data"]["order"] == order.pk
+        retry = WebhookDelivery.objects.get(endpoint=bad)
+        assert retry.attempts == 1 and retry.next_attempt_at > timezone.now()
+
+        for _ in range(2):
+            with django_capture_on_commit_callbacks(execute=True):
+                order.save()
+        WebhookDelivery.objects.filter(endpoint=bad).update(next_attempt_at=timezone.now())
+        dispatch_webhooks(batch_size=1)
+        bad.refresh_from_db()
+        assert bad.opened_at is not None and bad.failure_count == 2
+        held = WebhookDelivery.objects.filter(endpoint=bad, attempts=0)
+        assert held.exists() and dispatch_webhooks() == {"delivered": 0, "failed": 0}
+
+        failing.clear()
+        WebhookEndpoint.objects.filter(pk=bad.pk).update(opened_at=timezone.now() - timedelta(minutes=2))
+        WebhookDelivery.objects.filter(endpoint=bad).update(next_attempt_at=timezone.now())
+        assert dispatch_webhooks()["delivered"] == WebhookDelivery.objects.filter(endpoint=bad).count()
+        bad.refresh_from_db()
+        assert (bad.opened_at, bad.failure_count) == (None, 0)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_sms_providers_are_lazy(settings):
+    """
+    Test SMS provider selection and lazy client creation.
+
+    Steps:
+    - The Africa's Talking provider is wrapped in the circuit breaker and
+      opens no HTTP session before its first message.
+    - SMS_PROVIDER switches providers, including by dotted path.
+    - profile_imports reports the imports of django.setup().
+    """
+    from io import StringIO
+    from django.core.management import call_command
+    from orders import sms
+
+    settings.SMS_PROVIDER = "africastalking"
+    provider = sms.get_sms_provider()
+    assert isinstance(provider, sms.ResilientProvider)
+    assert isinstance(provider.provider, sms.AfricasTalkingProvider)
+    assert provider.provider.session is None
+
+    settings.SMS_PROVIDER = "orders.sms.NullProvider"
+    assert isinstance(sms.get_sms_provider(), sms.NullProvider)
+    assert sms.send_sms("+254700000001", "hello") is None
+
+    out = StringIO()
+    call_command("profile_imports", top=3, stdout=out)
+    lines = out.getvalue().splitlines()
+    assert "modules imported in" in lines[0] and len(lines) == 5
+
+
+def test_sms_breaker_ignores_stale_calls(settings):
+    """
+    Test that a call which started before the SMS breaker opened cannot
+    close it by succeeding late.
+    """
+    from orders import sms
+
+    settings.SMS = {"FAILURE_THRESHOLD": 1}
+    provider = sms.ResilientProvider(sms.NullProvider())
+    slow = provider._acquire()
+    failing = provider._acquire()
+    provider._record(failing, RuntimeError("down"))
+    assert provider.breaker.state(provider.state) == "open"
+
+    provider._record(slow, None)
+    assert provider.breaker.state(provider.state) == "open"
+    assert provider.metrics()["successes"] == 1
+
+
+def test_sms_circuit_breaker(settings):
+    """
+    Test timeouts and the circuit breaker around the SMS provider against a
+    local stub that injects faults.
+
+    Steps:
+    - A healthy stub returns the provider's JSON response.
+    - A stub slower than the read timeout fails within the timeout.
+    - Server errors open the breaker; later sends fail fast without
+      reaching the stub, and the state is published to the cache.
+    - Once the reset period has passed a single probe closes the breaker.
+    """
+    import threading
+    import time
+    from datetime import timedelta
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from django.core.cache import cache
+    from orders import sms
+
+    fault = {"mode": "ok"}
+    hits = []
+
+    class Stub(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            hits.append(fault["mode"])
+            if fault["mode"] == "slow":
+                time.sleep(1)
+            status = 500 if fault["mode"] == "error" else 201
+            body = b'{"SMSMessageData": {"Message": "Sent to 1/1"}}'
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.SMS_PROVIDER = "africastalking"
+    settings.SMS = {
+        "ENDPOINT": f"http://127.0.0.1:{server.server_port}/version1/messaging",
+        "READ_TIMEOUT": 0.2,
+        "FAILURE_THRESHOLD": 3,
+        "RESET_SECONDS": 30,
+    }
+    try:
+        provider = sms.get_sms_provider()
+        assert sms.send_sms("+254700000001", "hi")["SMSMessageData"]["Message"] == "Sent to 1/1"
+
+        fault["mode"] = "slow"
+        start = time.monotonic()
+        assert sms.send_sms("+254700000001", "hi") is None
+        assert time.monotonic() - start < 0.9
+
+        fault["mode"] = "error"
+        for _ in range(4):
+            sms.send_sms("+254700000001", "hi")
+        assert hits.count("error") == 2
+        metrics = cache.get("circuit:sms")
+        assert (metrics["state"], metrics["opened"], metrics["rejected"]) == ("open", 1, 2)
+
+        fault["mode"] = "ok"
+        provider.state.opened_at -= timedelta(seconds=31)
+        assert provider.breaker.state(provider.state) == "half_open"
+        assert sms.send_sms("+254700000001", "hi") is not None
+        assert cache.get("circuit:sms")["state"] == "closed"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_expire_stale_drafts(customer_factory, sms_outbox, django_capture_on_commit_callbacks):
+    """
+    Test batched expiry of stale DRAFT orders.
+
+    Steps:
+    - The stale-draft lookup is an index search.
+    - Only drafts older than the TTL are cancelled, across several batches,
+      each with one STATE_CANCELLED audit transaction.
+    - No SMS is sent, webhooks are queued, and the customer's order ETags
+      change.
+    """
+    from datetime import timedelta
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from django.utils import timezone
+    from orders.conditional import VERSION_KEY, get_versions, orders_scope
+    from orders.models import Order, Transaction, WebhookDelivery, WebhookEndpoint
+
+    plan = Order.objects.filter(state="DRAFT", created_at__lt=timezone.now()).order_by("created_at").explain()
+    assert "order_state_created_idx" in plan and "SCAN" not in plan
+
+    customer = customer_factory()
+    WebhookEndpoint.objects.create(url="http://127.0.0.1:9/hook", secret="s", events=["STATE_CANCELLED"])
+    old = timezone.now() - timedelta(hours=80)
+    stale = [customer.orders.create(created_at=old) for _ in range(3)]
+    fresh = customer.orders.create()
+    submitted = customer.orders.create(state="SUBMITTED", created_at=old)
+    sms_outbox.clear()
+    scope = orders_scope(customer.user_id)
+    before = get_versions([scope])[scope]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command("expire_drafts", batch_size=2)
+
+    states = dict(customer.orders.values_list("id", "state"))
+    assert [states[order.pk] for order in stale] == ["CANCELLED"] * 3
+    assert (states[fresh.pk], states[submitted.pk]) == ("DRAFT", "SUBMITTED")
+    cancelled = Transaction.objects.using(fresh._state.db).filter(action="STATE_CANCELLED")
+    assert sorted(cancelled.values_list("order_id", flat=True)) == [order.pk for order in stale]
+    assert WebhookDelivery.objects.filter(event="STATE_CANCELLED").count() == 3
+    assert sms_outbox == []
+    assert cache.get(VERSION_KEY % scope) != before
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_admin_changelists_scale(admin_client, customer_factory, inventory_factory, sms_outbox,
+                                 django_capture_on_commit_callbacks):
+    """
+    Test the admin changelists and bulk actions.
+
+    Steps:
+    - Every changelist (plain and filtered) runs the same number of queries
+      whatever the number of rows, and only counts through a LIMITed subquery.
+    - Pages of a filtered list past the count limit are still reachable.
+    - The bulk cancel action cancels placed/draft orders set-based, writes
+      their audit transactions and notifies the customers.
+    """
+    from unittest.mock import patch
+    from django.db import DEFAULT_DB_ALIAS, connection
+    from django.test.utils import CaptureQueriesContext
+    from orders.admin import EstimatedCountPaginator, OrderAdmin
+    from orders.models import (
+        Order, StockAlert, Transaction, WebhookDelivery, WebhookEndpoint,
+    )
+
+    customer = customer_factory()
+    inventory = inventory_factory()
+    endpoint = WebhookEndpoint.objects.create(url="http://127.0.0.1:9/hook", secret="s")
+    # The admin only shows the default database's orders when sharded.
+    orders = Order.objects.using(DEFAULT_DB_ALIAS)
+
+    def add_rows():
+        order = orders.create(customer=customer)
+        order.items.create(inventory=inventory, quantity=1)
+        StockAlert.objects.create(inventory=inventory, level="LOW_STOCK", on_hand=1)
+        WebhookDelivery.objects.create(endpoint=endpoint, event="CREATE_ORDER", payload={})
+
+    urls = [
+        "/admin/orders/customer/",
+        "/admin/orders/inventory/",
+        "/admin/orders/order/",
+        "/admin/orders/order/?state__exact=DRAFT",
+        "/admin/orders/orderitem/",
+        "/admin/orders/transaction/",
+        "/admin/orders/transaction/?action__exact=CREATE_ORDER",
+        "/admin/orders/stockalert/?status=pending",
+        "/admin/orders/webhookendpoint/",
+        "/admin/orders/webhookdelivery/?status=pending",
+    ]
+
+    def query_counts():
+        counts = []
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                assert admin_client.get(url).status_code == 200, url
+            for query in queries:
+                if "COUNT(" in query["sql"]:
+                    assert "LIMIT" in query["sql"], (url, query["sql"])
+            counts.append(len(queries))
+        return counts
+
+    add_rows()
+    few = query_counts()
+    for _ in range(5):
+        add_rows()
+    assert query_counts() == few
+
+    with patch.object(EstimatedCountPaginator, "count_limit", 2), patch.object(OrderAdmin, "list_per_page", 1):
+        response = admin_client.get("/admin/orders/order/", {"state__exact": "DRAFT", "p": 5})
+    assert response.status_code == 200
+    assert response.context["cl"].result_count == 6
+
+    placed = orders.create(customer=customer, state="PLACED")
+    fulfilled = orders.create(customer=customer, state="FULFILLED")
+    sms_outbox.clear()
+    with django_capture_on_commit_callbacks(execute=True):
+        response = admin_client.post("/admin/orders/order/", {
+            "action": "cancel_selected",
+            "_selected_action": [placed.pk, fulfilled.pk],
+        })
+    assert response.status_code == 302
+    assert dict(Order.objects.filter(pk__in=[placed.pk, fulfilled.pk]).values_list("id", "state")) == {
+        placed.pk: "CANCELLED", fulfilled.pk: "FULFILLED",
+    }
+    assert Transaction.objects.filter(order=placed, action="STATE_CANCELLED").count() == 1
+    assert [message for _, message in sms_outbox] == [f"Your order {placed.pk} has been cancelled."]
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_request_profiler(settings, tmp_path, customer_factory, inventory_factory, auth_client):
+    """
+    Test the sampling request profiler.
+
+    Steps:
+    - Requests without the token are not profiled while sampling is off,
+      and a wrong (or non-ASCII) token is ignored.
+    - A request with the token is profiled: the call stack covers the view,
+      serializer and signal handlers and the SQL is captured. The profile is
+      written by the background writer.
+    - profile_summary reports the endpoint, project hotspots and queries,
+      and only MAX_FILES profiles are kept.
+    """
+    import json
+    from io import StringIO
+    from django.core.management import call_command
+    from orders.profiling import writer
+
+    settings.PROFILING = {"SAMPLE_RATE": 0, "TOKEN": "s3cret", "DIRECTORY": str(tmp_path), "MAX_FILES": 2}
+    customer = customer_factory(user=auth_client.handler._force_user)
+    inventory = inventory_factory()
+    order = {"items": [{"inventory_id": inventory.id, "quantity": 1}]}
+
+    assert "X-Profile-Id" not in auth_client.post(reverse("order-list"), order, format="json")
+    for token in ("wrong", "sécret"):
+        response = auth_client.get(reverse("order-list"), HTTP_X_PROFILE_TOKEN=token)
+        assert response.status_code == 200 and "X-Profile-Id" not in response
+    assert not list(tmp_path.iterdir())
+
+    response = auth_client.post(reverse("order-list"), order, format="json", HTTP_X_PROFILE_TOKEN="s3cret")
+    assert response.status_code == 201
+    writer.wait()
+    meta = json.loads((tmp_path / f"{response['X-Profile-Id']}.json").read_text())
+    assert (meta["route"], meta["status"]) == ("order-list", 201)
+    assert any("INSERT INTO \"orders_order\"" in query["sql"] for query in meta["queries"])
+
+    out = StringIO()
+    call_command("profile_summary", dir=str(tmp_path), project=True, top=200, stdout=out)
+    report = out.getvalue()
+    assert "POST order-list" in report
+    for location in ("orders/views.py", "orders/serializers.py", "orders/signals.py"):
+        assert location in report
+    assert 'INSERT INTO "orders_order"' in report
+
+    for _ in range(2):
+        auth_client.get(reverse("order-list"), HTTP_X_PROFILE_TOKEN="s3cret")
+    writer.wait()
+    assert len(list(tmp_path.glob("*.prof"))) == len(list(tmp_path.glob("*.json"))) == 2
+    assert customer.orders.count() == 2
+
+
+@pytest.mark.django_db(databases="__all__")
+def test_bulk_stock_adjustment(auth_client, inventory_factory, tmp_path, django_capture_on_commit_callbacks):
+    """
+    Test the streaming bulk stock adjustment endpoint and command.
+
+    Steps:
+    - A CSV manifest applies relative and absolute changes by id and name,
+      and reports each bad line without failing the rest.
+    - The inventory ETags are invalidated once per batch, not once per line.
+    - Unsupported content types and CSV without the needed columns are rejected.
+    - The command applies an NDJSON manifest file in batches.
+    """
+    import json
+    from io import StringIO
+    from unittest.mock import patch
+    from django.core.management import call_command
+
+    widget = inventory_factory(name="Widget", on_hand=10)
+    gadget = inventory_factory(name="Gadget", on_hand=3)
+    url = reverse("inventory-bulk-adjust")
+
+    manifest = (
+        "id,name,delta,quantity\n"
+        f"{widget.id},,+5,\n"
+        ",Gadget,,40\n"
+        f"{widget.id},,-2,\n"
+        ",Gizmo,1,\n"
+        f"{gadget.id},,1,2\n"
+        ",Gadget,,-1\n"
+    )
+    with patch("orders.restock.bump_version") as bump, patch("orders.stock.bump_version") as row_bump, \
+            django_capture_on_commit_callbacks(execute=True):
+        response = auth_client.post(url, manifest, content_type="text/csv")
+    assert response.status_code == 200
+    assert (response.data["applied"], response.data["failed"]) == (3, 3)
+    results = response.data["results"]
+    assert [(r["line"], r["status"], r.get("on_hand")) for r in results] == [
+        (2, "ok", 15), (3, "ok", 40), (4, "ok", 13), (5, "error", None), (6, "error", None), (7, "error", None),
+    ]
+    assert "Gizmo" in results[3]["error"] and "exactly one" in results[4]["error"]
+    assert (bump.call_count, row_bump.call_count) == (1, 0)
+    widget.refresh_from_db()
+    gadget.refresh_from_db()
+    assert (widget.on_hand, gadget.on_hand) == (13, 40)
+
+    assert auth_client.post(url, manifest, content_type="application/json").status_code == 415
+    assert auth_client.post(url, "sku,count\n1,2\n", content_type="text/csv").status_code == 400
+
+    path = tmp_path / "restock.ndjson"
+    path.write_text("\n".join([
+        json.dumps({"name": "Widget", "delta": 7}),
+        "",
+        "not json",
+        json.dumps({"id": gadget.id, "quantity": 0}),
+    ]))
+    out = StringIO()
+    with patch("orders.restock.bump_version") as bump:
+        call_command("bulk_adjust_stock", str(path), batch_size=2, stdout=out, stderr=StringIO())
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [(r["line"], r["status"]) for r in lines] == [(1, "ok"), (3, "error"), (4, "ok")]
+    assert bump.call_count == 2
+    widget.refresh_from_db()
+    gadget.refresh_from_db()
+    assert (widget.on_hand, gadget.on_hand) == (20, 0)
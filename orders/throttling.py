@@ -0,0 +1,125 @@
+"""
+Token-bucket request throttles for the API.
+
+DRF's built-in `SimpleRateThrottle` keeps a list of request timestamps per
+client and rewrites the whole list on every request. These throttles keep a
+single integer per client instead (the bucket's "theoretical arrival time",
+as in the GCRA algorithm) and update it with atomic cache increments, so
+they stay cheap and correct when the cache is shared by several workers.
+
+The buckets are only as global as the cache: with a per-process cache
+(LocMemCache) each worker enforces the full rate on its own. Deployments
+with several workers must use a shared cache; the orders.E001 system check
+fails when they do not (see orders.checks).
+"""
+
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    Token bucket of `num_requests` tokens refilled evenly over `duration`.
+
+    The bucket state is stored as the time (in milliseconds) at which the
+    bucket would be completely full again. Each request adds one token's
+    worth of time with `cache.incr`; a request is refused when that time lies
+    further in the future than the bucket capacity, and the increment is
+    refunded.
+
+    Subclasses set `scope` and decide who is throttled via `get_ident_key`.
+    """
+    cache_format = "tb_%(scope)s_%(ident)s"
+
+    def get_ident_key(self, request):
+        """
+        Returns the identity the bucket belongs to: the user id for
+        authenticated requests, the client IP otherwise.
+        """
+        if request.user and request.user.is_authenticated:
+            return f"user-{request.user.pk}"
+        return f"ip-{self.get_ident(request)}"
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident_key(request),
+        }
+
+    def allow_request(self, request, view):
+        """
+        Take one token from the bucket, refusing the request if it is empty.
+        """
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = int(self.timer() * 1000)
+        self.interval = (self.duration * 1000) // self.num_requests or 1
+        self.capacity = self.duration * 1000
+        self.retry_in = None
+
+        # First request from this client (or the bucket expired while full).
+        if self.cache.add(self.key, self.now + self.interval, self.duration):
+            return True
+
+        try:
+            tat = self.cache.incr(self.key, self.interval)
+        except ValueError:
+            # The key expired between `add` and `incr`: the bucket is full.
+            self.cache.set(self.key, self.now + self.interval, self.duration)
+            return True
+
+        if tat - self.interval < self.now:
+            # The bucket had refilled completely; restart it from now.
+            self.cache.set(self.key, self.now + self.interval, self.duration)
+            return True
+
+        if tat - self.now > self.capacity:
+            self.cache.decr(self.key, self.interval)
+            self.retry_in = (tat - self.capacity - self.now) / 1000
+            return self.throttle_failure()
+
+        # Accepted requests leave `tat - now <= capacity` (= duration), so
+        # extending the key by `duration` keeps it until the bucket has
+        # drained; an expiry while still in debt would refill it early.
+        self.cache.touch(self.key, self.duration)
+        return True
+
+    def wait(self):
+        """
+        Returns the number of seconds until the next token is available.
+        """
+        return self.retry_in
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Per-user bucket (per-IP for anonymous clients) applied to every endpoint.
+    """
+    scope = "user"
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    """
+    Per-IP bucket applied to anonymous requests only, so one address cannot
+    flood the open endpoints by rotating through unauthenticated calls.
+    """
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return super().get_cache_key(request, view)
+
+
+class RegisterThrottle(TokenBucketThrottle):
+    """
+    Strict per-IP bucket for the customer registration endpoint.
+    """
+    scope = "register"
+
+    def get_ident_key(self, request):
+        return f"ip-{self.get_ident(request)}"
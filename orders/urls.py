@@ -1,11 +1,13 @@
 """
 URL configuration for the application.
 This module registers API endpoints for Customers, Inventory,
-Orders, and Transactions using Django REST Framework routers.
+Orders, and Transactions using Django REST Framework routers,
+plus the order change feed (Server-Sent Events).
 """
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .events import OrderEventsView
 from .views import CustomerViewSet, InventoryViewSet, OrderViewSet, TransactionViewSet
 
 # Create a default router and register API viewsets
@@ -17,5 +19,7 @@ router.register(r'transactions', TransactionViewSet)
 
 # Define URL patterns
 urlpatterns = [
+    # Registered ahead of the router so it is not taken for an order id.
+    path('orders/events/', OrderEventsView.as_view(), name='order-events'),
     path('', include(router.urls)),
 ]
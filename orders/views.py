@@ -2,6 +2,7 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from django.contrib.auth.models import User
+from django.db import transaction
 from rest_framework.response import Response
 from .models import Customer, Inventory, Order, Transaction
 from .serializers import (
@@ -10,18 +11,32 @@ from .serializers import (
     OrderSerializer,
     TransactionSerializer,
 )
+from .throttling import RegisterThrottle
+from .conditional import ConditionalGetMixin, INVENTORY_NAMES_SCOPE, INVENTORY_SCOPE, orders_scope
+from .fast_reads import CUSTOMER_FIELDS, INVENTORY_FIELDS, TRANSACTION_FIELDS, FastListMixin
+from .fieldsets import SparseFieldsetMixin
+from .filters import IndexedFilter, IndexedFilterBackend, parse_int, parse_iso_datetime
+from .restock import CONTENT_TYPES, ManifestError, apply_manifest, read_manifest
+from .sharding import customer_db, sharding_enabled
+from . import constants
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Customer records.
     Provides CRUD operations and a custom registration endpoint.
     """
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
+    fast_fields = CUSTOMER_FIELDS
     permission_classes = [permissions.AllowAny]
 
-    @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
+    @action(
+        detail=False,
+        methods=['post'],
+        permission_classes=[permissions.AllowAny],
+        throttle_classes=[RegisterThrottle],
+    )
     def register(self, request):
         """
         Custom action to register a new customer.
@@ -42,52 +57,114 @@ class CustomerViewSet(viewsets.ModelViewSet):
         if User.objects.filter(username=data['code']).exists():
             return Response({"error": "Username already exists."}, status=status.HTTP_400_BAD_REQUEST)
 
-        user = User.objects.create_user(
-            username=data['code'],
-            password=data['password'],
-            email=data.get('email', '')
-        )
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=data['code'],
+                password=data['password'],
+                email=data.get('email', '')
+            )
 
-        customer = Customer.objects.create(
-            user=user,
-            name=data['name'],
-            code=data['code'],
-            phone_number=data['phone_number']
-        )
+            customer = Customer.objects.create(
+                user=user,
+                name=data['name'],
+                code=data['code'],
+                phone_number=data['phone_number']
+            )
 
         return Response(CustomerSerializer(customer).data, status=status.HTTP_201_CREATED)
 
 
-class InventoryViewSet(viewsets.ModelViewSet):
+class InventoryViewSet(ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Inventory items.
-    Provides CRUD operations.
+    Provides CRUD operations, with ETag/Last-Modified support on reads.
     """
     queryset = Inventory.objects.all()
     serializer_class = InventorySerializer
+    fast_fields = INVENTORY_FIELDS
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [IndexedFilterBackend]
+    indexed_filters = {
+        "name_prefix": IndexedFilter("name", "prefix"),
+    }
+    filter_indexes = [("name",)]
 
+    def get_version_scopes(self):
+        return [INVENTORY_SCOPE]
 
-class OrderViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk-adjust')
+    def bulk_adjust(self, request):
+        """
+        Applies a restock manifest (see orders.restock) sent as the request
+        body with Content-Type text/csv or application/x-ndjson. The body is
+        read line by line rather than parsed up front, and changes are
+        committed in batches.
+
+        Returns:
+            Response: Counts of applied and failed lines, plus one result
+            per manifest line.
+        """
+        manifest_format = CONTENT_TYPES.get(request.content_type.split(';')[0].strip())
+        if manifest_format is None:
+            return Response(
+                {"error": f"Send the manifest as {' or '.join(CONTENT_TYPES)}."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            entries = read_manifest(request.stream or [], manifest_format)
+        except ManifestError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        results = list(apply_manifest(entries))
+        failed = sum(result["status"] == "error" for result in results)
+        return Response({"applied": len(results) - failed, "failed": failed, "results": results})
+
+
+class OrderViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Orders.
     Ensures that only the authenticated customer's orders are visible.
     Links new orders to the logged-in customer and triggers SMS notifications.
+    Reads carry ETag/Last-Modified headers scoped to the customer's orders.
     """
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    field_columns = {
+        "id": ("id",),
+        "state": ("state",),
+        "created_at": ("created_at",),
+        "items": (),
+    }
+    # Inventory is prefetched separately rather than joined, since items and
+    # inventory may live on different databases when orders are sharded.
+    field_prefetches = {
+        "items": ("items", "items__inventory"),
+    }
+    filter_backends = [IndexedFilterBackend]
+    indexed_filters = {
+        "state": IndexedFilter("state", choices=constants.ORDER_STATES),
+        "created_after": IndexedFilter("created_at", "gte", parse=parse_iso_datetime),
+        "created_before": IndexedFilter("created_at", "lt", parse=parse_iso_datetime),
+    }
+    # Both indexes lead with the customer, which get_queryset always filters on.
+    filter_indexes = [("state", "created_at"), ("created_at",)]
 
     def get_queryset(self):
         """
-        Restrict the queryset to orders belonging to the authenticated customer.
+        Restrict the queryset to orders belonging to the authenticated customer,
+        read from the database holding that customer's orders.
         """
         try:
             customer = Customer.objects.get(user=self.request.user)
-            return Order.objects.filter(customer=customer)
+            return Order.objects.using(customer_db(customer)).filter(customer=customer)
         except Customer.DoesNotExist:
             return Order.objects.none()
 
+    def get_version_scopes(self):
+        # Order items embed the inventory name, so renames count too; stock
+        # changes do not.
+        return [orders_scope(self.request.user.pk), INVENTORY_NAMES_SCOPE]
+
     def perform_create(self, serializer):
         """
         Create a new order linked to the authenticated customer.
@@ -96,16 +173,35 @@ class OrderViewSet(viewsets.ModelViewSet):
         customer = Customer.objects.get(user=self.request.user)
         order = serializer.save(customer=customer)
 
-        from .signals import send_sms
+        from .sms import send_sms
         message = f"Dear {customer.name}, your order #{order.id} has been placed."
         send_sms(customer.phone_number, message)
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet for managing Transactions.
     Provides CRUD operations for order-related transactions.
     """
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    fast_fields = TRANSACTION_FIELDS
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [IndexedFilterBackend]
+    indexed_filters = {
+        "action": IndexedFilter("action"),
+        "order": IndexedFilter("order", parse=parse_int),
+    }
+    filter_indexes = [("order",), ("action", "timestamp")]
+
+    def get_queryset(self):
+        """
+        When orders are sharded, restrict the queryset to the authenticated
+        customer's transactions, which all live on the customer's shard.
+        """
+        if not sharding_enabled():
+            return super().get_queryset()
+        customer = Customer.objects.filter(user=self.request.user).first()
+        if customer is None:
+            return Transaction.objects.none()
+        return Transaction.objects.using(customer_db(customer)).filter(order__customer=customer)
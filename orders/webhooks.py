@@ -0,0 +1,272 @@
+"""
+Outbound webhooks for order events.
+
+Every `Transaction` is queued as a WebhookDelivery for each active
+WebhookEndpoint subscribed to its action, once the transaction's database
+commits. Nothing is sent on the request thread: `dispatch_webhooks` (the
+`dispatch_webhooks` command) sends due deliveries concurrently through a
+bounded thread pool sharing one pooled HTTP session. Deliveries are claimed
+before they are sent (their next attempt is pushed WEBHOOKS["CLAIM_SECONDS"]
+ahead, under SELECT ... FOR UPDATE SKIP LOCKED where supported), so several
+dispatchers can run side by side without sending an event twice; a claim
+left by a crashed dispatcher expires and the delivery is retried.
+
+Payloads are signed with the endpoint secret:
+
+    X-Webhook-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of "<t>.<body>">
+
+Failed deliveries are retried with exponential backoff up to
+WEBHOOKS["MAX_ATTEMPTS"] times. An endpoint failing WEBHOOKS["FAILURE_THRESHOLD"]
+times in a row has its circuit opened: its deliveries wait for
+WEBHOOKS["CIRCUIT_RESET_SECONDS"], then one probe decides whether it resumes.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .fast_reads import iso_datetime
+from .models import WebhookDelivery, WebhookEndpoint
+from .resilience import CircuitBreaker, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+ENDPOINTS_CACHE_KEY = "webhook_endpoints"
+
+DEFAULTS = {
+    "WORKERS": 8,
+    "CONNECT_TIMEOUT": 3,
+    "READ_TIMEOUT": 10,
+    "MAX_ATTEMPTS": 8,
+    "BACKOFF_SECONDS": 30,
+    "BACKOFF_MAX_SECONDS": 3600,
+    "FAILURE_THRESHOLD": 5,
+    "CIRCUIT_RESET_SECONDS": 300,
+    # How long a dispatcher owns the deliveries it picked; must exceed the
+    # time to send a whole batch.
+    "CLAIM_SECONDS": 600,
+    # How long the active endpoint list may be served from the cache.
+    "ENDPOINTS_CACHE_SECONDS": 60,
+}
+
+
+def webhook_settings():
+    return {**DEFAULTS, **getattr(settings, "WEBHOOKS", {})}
+
+
+def get_breaker():
+    config = webhook_settings()
+    return CircuitBreaker(config["FAILURE_THRESHOLD"], config["CIRCUIT_RESET_SECONDS"])
+
+
+def active_endpoints():
+    """
+    Returns [(id, events)] of active endpoints, cached so queuing an event
+    costs no query when nobody subscribed. Saving an endpoint clears the
+    cache; WEBHOOKS["ENDPOINTS_CACHE_SECONDS"] bounds how long a change made
+    without signals (e.g. a queryset update) goes unnoticed.
+    """
+    endpoints = cache.get(ENDPOINTS_CACHE_KEY)
+    if endpoints is None:
+        endpoints = list(WebhookEndpoint.objects.filter(is_active=True).values_list("id", "events"))
+        cache.set(ENDPOINTS_CACHE_KEY, endpoints, webhook_settings()["ENDPOINTS_CACHE_SECONDS"])
+    return endpoints
+
+
+def invalidate_endpoints():
+    cache.delete(ENDPOINTS_CACHE_KEY)
+
+
+def event_payload(txn):
+    return {
+        "type": txn.action,
+        "created": iso_datetime(txn.timestamp),
+        "data": {
+            "id": txn.id,
+            "order": txn.order_id,
+            "customer": txn.customer_id,
+            "action": txn.action,
+            "description": txn.description,
+            "timestamp": iso_datetime(txn.timestamp),
+        },
+    }
+
+
+def enqueue_transactions(txns, using=None):
+    """
+    Queues deliveries of transactions to their subscribers once the
+    transactions' database commits, with one insert for the whole set.
+
+    Args:
+        txns (list[Transaction]): Saved transactions.
+        using (str | None): Database alias the transactions were written to.
+    """
+    endpoints = active_endpoints()
+    deliveries = [
+        WebhookDelivery(endpoint_id=pk, event=txn.action, payload=event_payload(txn))
+        for txn in txns
+        for pk, events in endpoints
+        if not events or txn.action in events
+    ]
+    if deliveries:
+        transaction.on_commit(lambda: WebhookDelivery.objects.bulk_create(deliveries), using=using)
+
+
+def sign(secret, timestamp, body):
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def build_session(pool_size):
+    """
+    Returns a requests session whose connection pool matches the worker
+    count, so connections to each endpoint are reused across deliveries.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def send_delivery(session, delivery, timeout):
+    """
+    POSTs one delivery. Runs in a worker thread and touches no database.
+
+    Returns:
+        str | None: The error, or None on a 2xx response.
+    """
+    body = json.dumps({"id": delivery.id, **delivery.payload}).encode()
+    timestamp = int(time.time())
+    try:
+        response = session.post(
+            delivery.endpoint.url,
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                "X-Webhook-Id": str(delivery.id),
+                "X-Webhook-Event": delivery.event,
+                "X-Webhook-Signature": sign(delivery.endpoint.secret, timestamp, body),
+            },
+            timeout=timeout,
+        )
+    except requests.RequestException as exc:
+        return f"{type(exc).__name__}: {exc}"
+    if response.status_code >= 300:
+        return f"HTTP {response.status_code}"
+    return None
+
+
+def due_deliveries(batch_size, breaker, now, claim_seconds):
+    """
+    Claims and returns the next due deliveries, skipping endpoints whose
+    circuit is open and taking a single probe delivery from half-open ones.
+
+    A delivery is claimed by moving its next attempt `claim_seconds` ahead,
+    with an update that only matches it while it is still due; deliveries
+    another dispatcher claimed first are left out.
+    """
+    reopened_before = now - timedelta(seconds=breaker.reset_seconds)
+    with transaction.atomic():
+        candidates = (
+            WebhookDelivery.objects.filter(
+                delivered_at__isnull=True,
+                failed_at__isnull=True,
+                next_attempt_at__lte=now,
+                endpoint__is_active=True,
+            )
+            .filter(Q(endpoint__opened_at__isnull=True) | Q(endpoint__opened_at__lte=reopened_before))
+            .select_related("endpoint")
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        deliveries, probed = [], set()
+        for delivery in candidates:
+            if delivery.endpoint.opened_at is not None:
+                if delivery.endpoint_id in probed:
+                    continue
+                probed.add(delivery.endpoint_id)
+            deliveries.append(delivery)
+
+        claimed_until = now + timedelta(seconds=claim_seconds)
+        WebhookDelivery.objects.filter(
+            pk__in=[delivery.pk for delivery in deliveries], next_attempt_at__lte=now
+        ).update(next_attempt_at=claimed_until)
+        claimed = set(
+            WebhookDelivery.objects.filter(
+                pk__in=[delivery.pk for delivery in deliveries], next_attempt_at=claimed_until
+            ).values_list("pk", flat=True)
+        )
+    return [delivery for delivery in deliveries if delivery.pk in claimed]
+
+
+def record_results(results, breaker, config):
+    """
+    Stores the outcome of a batch: delivery states in one bulk update, then
+    the health of each endpoint involved.
+    """
+    now = timezone.now()
+    endpoints = {}
+    for delivery, error in results:
+        endpoint = endpoints.setdefault(delivery.endpoint_id, delivery.endpoint)
+        delivery.attempts += 1
+        if error is None:
+            delivery.delivered_at = now
+            delivery.last_error = ""
+            breaker.record_success(endpoint)
+            endpoint.last_success_at = now
+            continue
+        delivery.last_error = error
+        if delivery.attempts >= config["MAX_ATTEMPTS"]:
+            delivery.failed_at = now
+        else:
+            delay = backoff_delay(delivery.attempts, config["BACKOFF_SECONDS"], config["BACKOFF_MAX_SECONDS"])
+            delivery.next_attempt_at = now + timedelta(seconds=delay)
+        endpoint.last_error = error
+        if breaker.record_failure(endpoint, now):
+            logger.warning("Webhook endpoint %s failing (%s); circuit opened.", endpoint.url, error)
+
+    WebhookDelivery.objects.bulk_update(
+        [delivery for delivery, _ in results],
+        ["attempts", "delivered_at", "failed_at", "next_attempt_at", "last_error"],
+    )
+    for endpoint in endpoints.values():
+        endpoint.save(update_fields=["failure_count", "opened_at", "last_success_at", "last_error"])
+
+
+def dispatch_webhooks(batch_size=200, workers=None, session=None):
+    """
+    Sends all due deliveries, `batch_size` at a time, on a pool of
+    `workers` threads.
+
+    Returns:
+        dict: Counts of "delivered" and "failed" attempts.
+    """
+    config = webhook_settings()
+    workers = workers or config["WORKERS"]
+    session = session or build_session(workers)
+    timeout = (config["CONNECT_TIMEOUT"], config["READ_TIMEOUT"])
+    breaker = get_breaker()
+    counts = {"delivered": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            deliveries = due_deliveries(batch_size, breaker, timezone.now(), config["CLAIM_SECONDS"])
+            if not deliveries:
+                return counts
+            errors = pool.map(lambda delivery: send_delivery(session, delivery, timeout), deliveries)
+            results = list(zip(deliveries, errors))
+            record_results(results, breaker, config)
+            for _, error in results:
+                counts["failed" if error else "delivered"] += 1